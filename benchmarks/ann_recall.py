@@ -0,0 +1,70 @@
+"""Compare IVF approximate search against exact search.
+
+Usage: python benchmarks/ann_recall.py [--count 200000] [--dim 384] [--k 10]
+
+Generates clustered synthetic embeddings, builds the exact
+:class:`modules.vector_index.VectorIndex` and an :class:`modules.ann_index.IVFIndex`
+on top of it, then reports recall@k and mean query latency for several
+``nprobe`` settings.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from modules.ann_index import IVFIndex  # noqa: E402
+from modules.vector_index import VectorIndex  # noqa: E402
+
+
+def synthetic(count: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    return centres[labels] + 0.5 * rng.normal(size=(count, dim)).astype(np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+
+    data = synthetic(args.count, args.dim, clusters=max(1, args.count // 500))
+    queries = synthetic(args.queries, args.dim, clusters=max(1, args.count // 500), seed=1)
+
+    index = VectorIndex()
+    index.add_many(enumerate(data, start=1))
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(index.ids(), index.rows(), nlist=args.nlist)
+    print(f"built IVF with {ivf.nlist} lists over {len(index)} vectors in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    truth = [{i for i, _s in index.search(q, args.k)} for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"exact      recall@{args.k}=1.000  {exact_ms:8.2f} ms/query")
+
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        if nprobe > ivf.nlist:
+            break
+        found = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            candidates = ivf.candidates(index.query_vector(q), nprobe)
+            hits = index.search(q, args.k, ids=candidates)
+            found += len(expected & {i for i, _s in hits})
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        recall = found / (args.k * args.queries)
+        print(f"nprobe={nprobe:<4} recall@{args.k}={recall:.3f}  {ms:8.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
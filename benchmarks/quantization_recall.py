@@ -0,0 +1,64 @@
+"""Measure memory use and recall of int8-quantized search with rescoring.
+
+Usage: python benchmarks/quantization_recall.py [--count 100000] [--dim 384] [--k 10]
+
+Builds a float32 :class:`modules.vector_index.VectorIndex` and an int8
+:class:`modules.vector_index.QuantizedIndex` over the same synthetic
+embeddings. It reports the bytes each holds, recall@k against exact search
+and latency, with and without full-precision rescoring.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from modules.vector_index import QuantizedIndex, VectorIndex  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(args.count, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    originals = {i: data[i - 1] for i in range(1, args.count + 1)}
+
+    exact = VectorIndex()
+    exact.add_many(enumerate(data, start=1))
+    float_bytes = exact.rows().nbytes
+
+    def fetch(ids):
+        return {i: originals[i] for i in ids}
+
+    start = time.perf_counter()
+    truth = [{i for i, _s in exact.search(q, args.k)} for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"float32    {float_bytes / 2**20:8.1f} MiB  recall@{args.k}=1.000  {exact_ms:7.2f} ms/query")
+
+    for oversample in (1, 2, 4, 8):
+        index = QuantizedIndex(fetch, oversample=oversample)
+        index.add_many(enumerate(data, start=1))
+        found = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            found += len(expected & {i for i, _s in index.search(q, args.k)})
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        recall = found / (args.k * args.queries)
+        print(
+            f"int8 x{oversample:<3} {index.nbytes() / 2**20:8.1f} MiB  "
+            f"recall@{args.k}={recall:.3f}  {ms:7.2f} ms/query"
+        )
+
+
+if __name__ == "__main__":
+    main()
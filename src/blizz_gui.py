@@ -12,6 +12,9 @@ from modules.command_executor import execute_command
 from modules import chat_db, summarizer
 from modules.guidance_api import guidance_api
 from modules import dashboard
+from modules.retention import start_background_compaction
+from modules.embedding_utils import warm_up
+from modules.streaming import ThinkSplitter
 
 
 class ChatSession:
@@ -26,6 +29,7 @@ class ChatSession:
         self.session_id = session_id
         self.frame = tk.Frame(parent, bg="#1e1e1e")
         self.messages: list[dict] = []
+        self._streaming = False
 
         self.file_path = (
             Path(__file__).resolve().parent.parent
@@ -280,11 +284,52 @@ class ChatSession:
                     "logic_notes": "",
                 }
             else:
-                response = handle_user_input(user_text)
+                self._stream_reply(user_text)
+                return
 
         chat_txt, logic_txt = self.structure_response(response)
         self.gui.root.after(0, lambda: self._handle_response(chat_txt, logic_txt))
 
+    def _stream_reply(self, user_text: str) -> None:
+        """Show the model's reply in the panes as it is generated."""
+        splitter = ThinkSplitter()
+
+        def on_token(chunk: str) -> None:
+            chat_part, logic_part = splitter.feed(chunk)
+            self.gui.root.after(0, lambda: self._append_chunk(chat_part, logic_part))
+
+        response = handle_user_input(user_text, on_token=on_token)
+        chat_part, _ = splitter.finish()
+        _, logic_txt = self.structure_response(response)
+        think_txt = splitter.logic_text
+        self.gui.root.after(
+            0, lambda: self._finish_stream(chat_part, splitter.chat_text, think_txt, logic_txt)
+        )
+
+    def _append_chunk(self, chat_part: str, logic_part: str) -> None:
+        if chat_part:
+            if not self._streaming:
+                self._streaming = True
+                self._append_text(self.chat_log, "Bot: ")
+            self._append_text(self.chat_log, chat_part)
+        if logic_part:
+            self._append_text(self.logic_box, logic_part)
+
+    def _finish_stream(self, tail: str, chat_txt: str, think_txt: str, logic_txt: str) -> None:
+        """Close the streamed message and record it like a normal reply."""
+        self._append_chunk(tail, "")
+        if self._streaming:
+            self._append_text(self.chat_log, "\n")
+            self._streaming = False
+        if think_txt:
+            self._append_text(self.logic_box, "\n")
+        if chat_txt:
+            self.messages.append({"type": "assistant_response", "content": chat_txt})
+        self.update_displays("", logic_txt)
+        self.append_history("bot", chat_txt)
+        if hasattr(self.gui, "dashboard"):
+            dashboard.refresh_dashboard()
+
     def _handle_response(self, chat_txt: str, logic_txt: str) -> None:
         # update_displays already prefixes bot messages, so pass the raw text
         # to avoid duplicating the label.
@@ -467,6 +512,8 @@ class BlizzGUI:
 
 
 def main() -> None:
+    warm_up()
+    start_background_compaction()
     root = tk.Tk()
     BlizzGUI(root)
     root.mainloop()
@@ -1,19 +1,151 @@
 import os
 import json
 import logging
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
-def load_neocortex_config():
-    """Load main bot configuration from a JSON file."""
-    config_file = os.path.join(os.path.dirname(__file__), "neocortex.json")
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), "neocortex.json")
+# How often, at most, the config file is stat()ed for changes.
+CHECK_INTERVAL_MS = 500
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return ConfigSnapshot(value)
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, ConfigSnapshot):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class ConfigSnapshot(Mapping):
+    """Read-only view of ``neocortex.json`` as parsed at one point in time.
+
+    Nested objects are snapshots too and lists become tuples, so a snapshot
+    can be shared between threads and callers without copying.
+    """
+
+    def __init__(self, data: Dict[str, Any] | None = None) -> None:
+        self._data = {key: _freeze(value) for key, value in (data or {}).items()}
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot({self._data!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a mutable deep copy as plain dicts and lists."""
+        return _thaw(self)
+
+    @property
+    def model(self) -> str:
+        return self.get("model", "gpt-4o")
+
+    @property
+    def use_emoji(self) -> bool:
+        return bool(self.get("use_emoji", False))
+
+    @property
+    def memory_limit(self) -> int | None:
+        return self.get("memory_limit")
+
+    @property
+    def system_goal(self) -> str:
+        return self.get("system_goal", "")
+
+    @property
+    def allowed_commands(self) -> Tuple[str, ...]:
+        return tuple(self.get("allowed_commands", ()))
+
+    @property
+    def restricted_commands(self) -> Tuple[str, ...]:
+        return tuple(self.get("restricted_commands", ()))
+
+
+_snapshot: ConfigSnapshot | None = None
+_stat_key: Tuple[int, int] | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_subscribers: List[Callable[[ConfigSnapshot], None]] = []
+
+
+def _stat(path: str) -> Tuple[int, int] | None:
     try:
-        with open(config_file, "r", encoding="utf-8") as file:
-            return json.load(file)
-    except Exception as e:
-        logger.error("Error loading config: %s", e)
-        return {}
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_neocortex_config() -> ConfigSnapshot:
+    """Return the current configuration snapshot.
+
+    The parsed file is cached per process. At most every
+    ``CHECK_INTERVAL_MS`` the file's mtime and size are compared with the
+    cached ones and it is re-parsed only when they differ; subscribers are
+    then notified. A file that fails to parse keeps the last good snapshot.
+    """
+    global _snapshot, _stat_key, _checked_at
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and (now - _checked_at) * 1000 < CHECK_INTERVAL_MS:
+        return snapshot
+    with _lock:
+        key = _stat(CONFIG_FILE)
+        if _snapshot is not None and key == _stat_key:
+            _checked_at = now
+            return _snapshot
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as file:
+                fresh = ConfigSnapshot(json.load(file))
+        except Exception as e:
+            logger.error("Error loading config: %s", e)
+            fresh = _snapshot if _snapshot is not None else ConfigSnapshot()
+        changed = _snapshot is not None and fresh is not _snapshot
+        _snapshot, _stat_key, _checked_at = fresh, key, now
+        subscribers = list(_subscribers) if changed else []
+    for callback in subscribers:
+        try:
+            callback(fresh)
+        except Exception:
+            logger.exception("Config subscriber %r failed", callback)
+    return fresh
+
+
+def subscribe(callback: Callable[[ConfigSnapshot], None]) -> Callable[[], None]:
+    """Call ``callback(snapshot)`` whenever a changed config is loaded.
+
+    Returns a function that removes the subscription.
+    """
+    with _lock:
+        _subscribers.append(callback)
+
+    def unsubscribe() -> None:
+        with _lock:
+            if callback in _subscribers:
+                _subscribers.remove(callback)
+
+    return unsubscribe
+
 
 def init_environment():
     """Load environment variables and create required directories."""
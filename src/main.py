@@ -2,11 +2,15 @@ from modules.interface import display_interface
 from config.config_loader import init_environment, load_neocortex_config
 from modules.memory_handler import process_memory
 from modules.chat_handler import chat_loop
+from modules.retention import start_background_compaction
+from modules.embedding_utils import warm_up
 
 def main():
     init_environment()
+    warm_up()
     display_interface()
     process_memory()
+    start_background_compaction()
     chat_loop()
 
 if __name__ == "__main__":
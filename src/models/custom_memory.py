@@ -1,44 +1,227 @@
+import atexit
 import json
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
 
 from config.config_loader import load_neocortex_config
 
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except Exception:  # pragma: no cover
+    fcntl = None
+
+# Rewrite the JSON file and truncate the log after this many appends.
+COMPACT_EVERY = 50
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+class _MemoryBackend:
+    """In-memory conversation history shared by every handle on one file.
+
+    ``memory.json`` holds the last compacted state and new exchanges are
+    appended to ``memory.json.log`` one JSON line at a time. Opening replays
+    the log, and :meth:`compact` folds it back into the JSON file.
+
+    Other processes may append to or compact the same files, so writes hold
+    ``memory.json.lock`` and first pick up whatever the files gained since
+    this process last read them.
+
+    ``appended`` counts every entry ever added, including ones trimmed from
+    the window since; compaction records it in ``memory.json.meta``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = path + ".log"
+        self.lock_path = path + ".lock"
+        self.meta_path = path + ".meta"
+        self.lock = threading.RLock()
+        with self.lock, self._file_lock():
+            self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _load(self):
+        """Read the JSON file and the whole log from scratch."""
+        self.pending = 0
+        self.log_offset = 0
+        self.file_id = self._file_id()
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            self.extra = None
+            self.history = deque(data)
+        elif isinstance(data, dict) and "conversation_history" in data:
+            self.extra = {k: v for k, v in data.items() if k != "conversation_history"}
+            self.history = deque(data["conversation_history"])
+        else:
+            self.extra = None
+            self.history = deque()
+        try:
+            with open(self.meta_path, "r") as f:
+                self.appended = json.load(f)["appended"]
+        except (OSError, ValueError, KeyError):
+            self.appended = len(self.history)
+        self._read_log()
+
+    def _file_id(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def _read_log(self):
+        """Append log lines past ``log_offset`` to the history."""
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                f.seek(self.log_offset)
+                for line in f:
+                    try:
+                        self.history.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # torn final write
+                    self.log_offset += len(line)
+                    self.pending += 1
+                    self.appended += 1
+        self._trim()
+
+    def _sync(self):
+        """Pick up changes other processes made; caller holds both locks."""
+        if self._file_id() != self.file_id:
+            self._load()  # compacted elsewhere; the JSON file has it all
+        else:
+            self._read_log()
+
+    def _trim(self):
+        limit = load_neocortex_config().get("memory_limit")
+        if isinstance(limit, int):
+            while len(self.history) > limit:
+                self.history.popleft()
+
+    def extend(self, entries):
+        """Add ``entries`` with a single write to the log."""
+        if not entries:
+            return
+        with self.lock, self._file_lock():
+            self._sync()
+            self.history.extend(entries)
+            self._trim()
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.log_offset:
+                os.truncate(self.log_path, self.log_offset)  # drop a torn final write
+            with open(self.log_path, "ab") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8"))
+                self.log_offset = f.tell()
+            self.pending += len(entries)
+            self.appended += len(entries)
+            if self.pending >= COMPACT_EVERY:
+                self._compact()
+
+    def snapshot(self):
+        with self.lock:
+            if self.extra is None:
+                return list(self.history)
+            return {**self.extra, "conversation_history": list(self.history)}
+
+    def snapshot_with_count(self):
+        """Return :meth:`snapshot` and ``appended`` read together."""
+        with self.lock:
+            return self.snapshot(), self.appended
+
+    def compact(self):
+        with self.lock, self._file_lock():
+            self._sync()
+            self._compact()
+
+    def _compact(self):
+        # Caller holds both locks and has synced with the files.
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(tmp, self.path)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump({"appended": self.appended}, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.pending = 0
+        self.log_offset = 0
+        self.file_id = self._file_id()
+
+    def clear(self):
+        with self.lock, self._file_lock():
+            self.history.clear()
+            self.extra = None
+            self._compact()
+
+
+def _backend_for(path):
+    key = os.path.abspath(path)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = _MemoryBackend(key)
+        return _backends[key]
+
+
+def compact_all():
+    """Fold every open append log back into its JSON file."""
+    with _backends_lock:
+        backends = list(_backends.values())
+    for backend in backends:
+        if backend.pending:
+            backend.compact()
+
+
+atexit.register(compact_all)
+
+
 class CustomMemory:
+    """Conversation history bounded by ``memory_limit`` in ``neocortex.json``.
+
+    Instances on the same file share one in-memory backend, so reads never
+    touch the disk and a save appends a single line instead of rewriting the
+    file.
+    """
+
     def __init__(self, memory_file=os.path.join(os.path.dirname(__file__), "memory.json")):
         self.memory_file = memory_file
         if not os.path.exists(self.memory_file):
             with open(self.memory_file, "w") as f:
                 json.dump([], f)
+        self._backend = _backend_for(self.memory_file)
 
     def save_context(self, user_input, bot_response):
-        config = load_neocortex_config()
-        memory_limit = config.get("memory_limit")
+        self._backend.extend([{"user": user_input, "bot": bot_response}])
 
-        with open(self.memory_file, "r") as f:
-            data = json.load(f)
+    def save_contexts(self, entries):
+        """Save ``{"user": ..., "bot": ...}`` entries with one write."""
+        self._backend.extend([{"user": e["user"], "bot": e["bot"]} for e in entries])
 
-        new_entry = {"user": user_input, "bot": bot_response}
-
-        if isinstance(data, list):
-            data.append(new_entry)
-            if isinstance(memory_limit, int) and len(data) > memory_limit:
-                data = data[-memory_limit:]
-        elif isinstance(data, dict) and "conversation_history" in data:
-            history = data["conversation_history"]
-            history.append(new_entry)
-            if isinstance(memory_limit, int) and len(history) > memory_limit:
-                history = history[-memory_limit:]
-            data["conversation_history"] = history
-        else:
-            data = [new_entry]
+    def load_memory(self):
+        return self._backend.snapshot()
 
-        with open(self.memory_file, "w") as f:
-            json.dump(data, f, indent=4)
+    def load_memory_with_count(self):
+        """Return the history plus how many entries were ever appended to it.
 
-    def load_memory(self):
-        with open(self.memory_file, "r") as f:
-            return json.load(f)
+        The count only grows, so callers can remember it to find the entries
+        added since, even after older ones slid out of the window.
+        """
+        return self._backend.snapshot_with_count()
 
     def clear_memory(self):
-        with open(self.memory_file, "w") as f:
-            json.dump([], f)
+        self._backend.clear()
+
+    def compact(self):
+        """Rewrite ``memory.json`` from memory and drop the append log."""
+        self._backend.compact()
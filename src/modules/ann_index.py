@@ -0,0 +1,150 @@
+"""Approximate nearest-neighbour search using an inverted-file (IVF) index.
+
+The index partitions the cached embedding matrix of :mod:`vector_index` into
+``nlist`` clusters with spherical k-means. A query only scores the entries in
+the ``nprobe`` closest clusters, so raising ``nprobe`` trades latency for
+recall. The inverted lists hold entry ids rather than vectors, which keeps the
+index small enough to persist next to the SQLite store.
+"""
+
+import math
+from pathlib import Path
+from typing import Iterable, List, Sequence
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+
+def available() -> bool:
+    """Return ``True`` when NumPy is installed and the index can be used."""
+    return np is not None
+
+
+def default_nlist(count: int) -> int:
+    """Heuristic list count (about ``sqrt(n)``) for ``count`` vectors."""
+    return max(1, int(math.sqrt(count)))
+
+
+def _assign(rows, centroids, chunk: int = 65536):
+    labels = np.empty(len(rows), dtype=np.int64)
+    for start in range(0, len(rows), chunk):
+        block = rows[start : start + chunk]
+        labels[start : start + chunk] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(rows, nlist: int, iterations: int = 10, seed: int = 0):
+    """Return ``nlist`` unit-length centroids for the normalised ``rows``."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(rows))
+    sample = rows
+    if len(rows) > nlist * 256:
+        sample = rows[rng.choice(len(rows), nlist * 256, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index mapping k-means clusters to entry ids."""
+
+    def __init__(self, centroids, nprobe: int = 8) -> None:
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        self.max_id = 0
+        self._lists: List[List[int]] = [[] for _ in range(len(self.centroids))]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._lists)
+
+    @classmethod
+    def build(cls, ids: Sequence[int], rows, nlist: int | None = None, nprobe: int = 8) -> "IVFIndex":
+        """Train centroids on ``rows`` and file every id into its cluster."""
+        nlist = nlist or default_nlist(len(rows))
+        index = cls(kmeans(rows, nlist), nprobe=nprobe)
+        index.add_many(ids, rows)
+        return index
+
+    def _fit_width(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float32))
+        width = self.centroids.shape[1]
+        if rows.shape[1] > width:
+            pad = np.zeros((len(self.centroids), rows.shape[1] - width), dtype=np.float32)
+            self.centroids = np.hstack([self.centroids, pad])
+        elif rows.shape[1] < width:
+            rows = np.hstack([rows, np.zeros((len(rows), width - rows.shape[1]), dtype=np.float32)])
+        return rows
+
+    def add_many(self, ids: Iterable[int], rows) -> None:
+        """Assign normalised ``rows`` to their nearest centroid."""
+        ids = list(ids)
+        if not ids:
+            return
+        labels = _assign(self._fit_width(rows), self.centroids)
+        for entry_id, label in zip(ids, labels.tolist()):
+            self._lists[label].append(entry_id)
+        self.max_id = max(self.max_id, max(ids))
+
+    def add(self, entry_id: int, row) -> None:
+        self.add_many([entry_id], [row])
+
+    def candidates(self, query, nprobe: int | None = None):
+        """Return the ids stored in the ``nprobe`` clusters closest to ``query``."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        q = self._fit_width(query)[0]
+        scores = self.centroids @ q
+        if nprobe < self.nlist:
+            probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.nlist)
+        chosen = [self._lists[i] for i in probe.tolist() if self._lists[i]]
+        if not chosen:
+            return np.zeros(0, dtype=np.int64)
+        ids = np.concatenate([np.asarray(c, dtype=np.int64) for c in chosen])
+        ids.sort()
+        return ids
+
+    def save(self, path: str | Path) -> None:
+        lengths = np.array([len(ids) for ids in self._lists], dtype=np.int64)
+        flat = np.fromiter(
+            (i for ids in self._lists for i in ids), dtype=np.int64, count=int(lengths.sum())
+        )
+        tmp = Path(str(path) + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                lengths=lengths,
+                ids=flat,
+                meta=np.array([self.nprobe, self.max_id], dtype=np.int64),
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IVFIndex":
+        with np.load(path) as data:
+            nprobe, max_id = (int(v) for v in data["meta"])
+            index = cls(data["centroids"], nprobe=nprobe)
+            offsets = np.concatenate([[0], np.cumsum(data["lengths"])])
+            flat = data["ids"]
+            index._lists = [
+                flat[offsets[i] : offsets[i + 1]].tolist() for i in range(index.nlist)
+            ]
+        index.max_id = max_id
+        return index
@@ -1,53 +1,94 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator
 
-_DB_PATH = Path(__file__).resolve().parent.parent / "models" / "chat_history.db"
+from .db_pool import ConnectionPool
 
-_connection = None
+_DB_PATH = Path(__file__).resolve().parent.parent / "models" / "chat_history.db"
 
-def _get_conn():
-    global _connection
-    if _connection is None:
-        _connection = sqlite3.connect(_DB_PATH)
-        _connection.execute(
-            "CREATE TABLE IF NOT EXISTS messages (chat_id INTEGER, timestamp TEXT, role TEXT, message TEXT)"
-        )
-        _connection.execute(
-            "CREATE TABLE IF NOT EXISTS summaries (chat_id INTEGER, timestamp TEXT, summary_text TEXT)"
-        )
-        _connection.commit()
-    return _connection
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
 
 
-def record_message(chat_id: int, role: str, message: str) -> None:
-    conn = _get_conn()
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS messages (chat_id INTEGER, timestamp TEXT, role TEXT, message TEXT)"
+    )
     conn.execute(
-        "INSERT INTO messages (chat_id, timestamp, role, message) VALUES (?, ?, ?, ?)",
-        (chat_id, datetime.utcnow().isoformat() + "Z", role, message),
+        "CREATE TABLE IF NOT EXISTS summaries (chat_id INTEGER, timestamp TEXT, summary_text TEXT)"
     )
-    conn.commit()
+
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(_DB_PATH, setup=_create_schema)
+        return _pool
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return connection pool counters for the chat history database."""
+    return _get_pool().stats()
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Group every write in the block into one commit."""
+    with _get_pool().transaction() as conn:
+        yield conn
+
+
+def record_message(chat_id: int, role: str, message: str) -> None:
+    record_messages([(chat_id, role, message)])
+
+
+def record_messages(messages: Iterable[tuple[int, str, str]]) -> None:
+    """Insert ``(chat_id, role, message)`` rows in a single transaction."""
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO messages (chat_id, timestamp, role, message) VALUES (?, ?, ?, ?)",
+            [(chat_id, timestamp, role, message) for chat_id, role, message in messages],
+        )
 
 
 def get_messages(chat_id: int):
-    conn = _get_conn()
-    cur = conn.execute(
-        "SELECT role, message FROM messages WHERE chat_id=? ORDER BY rowid", (chat_id,)
-    )
-    return cur.fetchall()
+    with _get_pool().reader() as conn:
+        cur = conn.execute(
+            "SELECT role, message FROM messages WHERE chat_id=? ORDER BY rowid", (chat_id,)
+        )
+        return cur.fetchall()
 
 
 def delete_chat(chat_id: int) -> None:
-    conn = _get_conn()
-    conn.execute("DELETE FROM messages WHERE chat_id=?", (chat_id,))
-    conn.execute("DELETE FROM summaries WHERE chat_id=?", (chat_id,))
-    conn.commit()
+    with transaction() as conn:
+        conn.execute("DELETE FROM messages WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM summaries WHERE chat_id=?", (chat_id,))
 
 
 def record_summary(chat_id: int, summary: str) -> None:
-    conn = _get_conn()
-    conn.execute(
-        "INSERT INTO summaries (chat_id, timestamp, summary_text) VALUES (?, ?, ?)",
-        (chat_id, datetime.utcnow().isoformat() + "Z", summary),
-    )
-    conn.commit()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO summaries (chat_id, timestamp, summary_text) VALUES (?, ?, ?)",
+            (chat_id, datetime.utcnow().isoformat() + "Z", summary),
+        )
+
+
+def prune(max_age_days: float) -> int:
+    """Delete messages and summaries older than ``max_age_days``."""
+    cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat() + "Z"
+    with transaction() as conn:
+        removed = conn.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff,)).rowcount
+        removed += conn.execute("DELETE FROM summaries WHERE timestamp < ?", (cutoff,)).rowcount
+    return removed
+
+
+def optimize() -> None:
+    """Reclaim free pages and refresh planner statistics."""
+    with transaction() as conn:
+        conn.execute("VACUUM")
+        conn.execute("ANALYZE")
@@ -1,8 +1,10 @@
 import json
+import logging
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from langchain_openai import ChatOpenAI
-from config.config_loader import load_neocortex_config
+from config.config_loader import load_neocortex_config, subscribe
 from modules.memory_handler import (
     retrieve_processed_memory,
     neuron_advice,
@@ -13,14 +15,35 @@ from modules.command_executor import execute_command
 from modules import event_logger
 from modules import context
 from modules import summarizer
+from modules import ingestion
+from modules import response_cache
+from modules.streaming import ThinkSplitter
 from modules.short_term_cache import cache as memory_cache
 
+logger = logging.getLogger(__name__)
+
 memory = CustomMemory()
 
+# Context stages for a turn run concurrently on this shared pool.
+_context_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="context")
+# Per-stage deadlines, overridable via ``context_assembly.deadlines_ms``.
+DEFAULT_STAGE_DEADLINES_MS = {"intent": 250, "guidance": 1000, "relevant": 1500}
+
 # Initialize AI model ONCE (instead of every function call)
 model_name = load_neocortex_config().get("model", "gpt-4o")
 main_bot = ChatOpenAI(model=model_name)
 
+
+def _on_config_change(config):
+    """Switch models when ``model`` is edited in the running config."""
+    global main_bot, model_name
+    if config.get("model", "gpt-4o") != model_name:
+        model_name = config.get("model", "gpt-4o")
+        main_bot = ChatOpenAI(model=model_name)
+
+
+subscribe(_on_config_change)
+
 # Dynamic greeting system
 greetings = [
     "Yo, what’s good?",
@@ -73,45 +96,131 @@ def generate_contextual_response(user_input: str) -> str | None:
         if cmd == "scan" and "port" in lower:
             return out
 
-    # Check conversation history for the last bot reply if requested
-    structured_memory = retrieve_processed_memory()
-    conv_history = structured_memory.get("conversation_history", [])
-    if conv_history and any(k in lower for k in ("last message", "previous message")):
-        return conv_history[-1].get("bot", "")
+    # Check conversation history for the last bot reply if requested; the
+    # processed memory is only consulted once the question asks for it.
+    if any(k in lower for k in ("last message", "previous message")):
+        conv_history = retrieve_processed_memory().get("conversation_history", [])
+        if conv_history:
+            return conv_history[-1].get("bot", "")
 
     return None
 
-def handle_user_input(user_input):
-    """Process a single exchange and return a structured response."""
+def _detect_intent(user_input):
+    # Detect intent using the lightweight classifier
+    from modules.intent_detection import get_intent
+    return get_intent(user_input)
+
+
+def _neuron_guidance(user_input, config, retrieve, advise):
+    conversation_history = retrieve().get("conversation_history", [])
+    return advise(user_input, conversation_history, config)
+
+
+def _assemble_context(user_input, config):
+    """Run the independent context stages of a turn concurrently.
+
+    Each stage must finish within its deadline, measured from the start of
+    assembly; a stage that fails or runs late is left out of the result
+    rather than holding up the reply.
+    """
+    deadlines = {
+        **DEFAULT_STAGE_DEADLINES_MS,
+        **config.get("context_assembly", {}).get("deadlines_ms", {}),
+    }
+    stages = {
+        "intent": (_detect_intent, user_input),
+        "guidance": (_neuron_guidance, user_input, config, retrieve_processed_memory, neuron_advice),
+        "relevant": (summarizer.retrieve_relevant, user_input, 3),
+    }
+    start = time.monotonic()
+    futures = {name: _context_pool.submit(*call) for name, call in stages.items()}
+    results = {}
+    for name, future in futures.items():
+        remaining = start + deadlines[name] / 1000 - time.monotonic()
+        try:
+            results[name] = future.result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            logger.warning("Context stage %s missed its %s ms deadline", name, deadlines[name])
+            ingestion.submit(event_logger.log_event, "context_stage_timeout", {"stage": name})
+        except Exception:
+            logger.exception("Context stage %s failed", name)
+    return results
+
+
+def _persist_exchange(user_input, final):
+    # Persist the exchange in the background so the reply returns at once.
+    # History updates share a key so they are applied in order.
+    ingestion.submit(memory_cache.add_message, user_input, final, key="history")
+    ingestion.submit(event_logger.log_event, "bot_response", {"text": final}, key="history")
+    ingestion.submit(summarizer.summarize_and_store, "default", user_input)
+
+
+def _generate(prompt, on_token=None):
+    """Return the model's reply text and whether it was passed to ``on_token``.
+
+    With ``on_token`` the reply is streamed chunk by chunk. A reply that opens
+    with ``{`` is held back, since structured JSON is only shown once parsed.
+    Models without ``stream`` fall back to a single ``invoke``.
+    """
+    if on_token is None or not hasattr(main_bot, "stream"):
+        return main_bot.invoke(prompt).content, False
+    parts = []
+    streaming = False
+    for chunk in main_bot.stream(prompt):
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if not text:
+            continue
+        parts.append(text)
+        if streaming:
+            on_token(text)
+            continue
+        head = "".join(parts).lstrip()
+        if head and not head.startswith("{"):
+            streaming = True
+            on_token("".join(parts))
+    return "".join(parts), streaming
+
+
+def handle_user_input(user_input, on_token=None):
+    """Process a single exchange and return a structured response.
+
+    ``on_token`` is called with each piece of the reply as it arrives, so
+    callers can display it before generation has finished.
+    """
     config = load_neocortex_config()
-    structured_memory = retrieve_processed_memory()
-    conversation_history = structured_memory.get("conversation_history", [])
     event_logger.log_event("user_input", {"text": user_input})
 
-    # Detect intent using the lightweight classifier
-    try:
-        from modules.intent_detection import get_intent
-        intent = get_intent(user_input)
-    except Exception:
-        intent = None
+    use_cache = response_cache.enabled()
+    if use_cache:
+        cached = response_cache.get_cache().get(user_input)
+        if cached is not None:
+            event_logger.log_event("response_cache_hit", {"text": user_input})
+            if on_token is not None:
+                on_token(cached["final_response"])
+            _persist_exchange(user_input, cached["final_response"])
+            return cached
+
+    gathered = _assemble_context(user_input, config)
+    intent = gathered.get("intent")
     if intent:
         event_logger.log_event("intent_detected", {"intent": intent})
 
-    # Get guidance from Neuron
-    guidance = neuron_advice(user_input, conversation_history, config)
-    relevant = summarizer.retrieve_relevant(user_input, k=3)
-    context_snippet = "\n".join(relevant)
-    combined_prompt = (
-        f"Relevant context: {context_snippet}\n"
-        f"Neuron's guidance: {guidance}\n\nUser: {user_input}\nBot:"
-    )
+    # Stages that timed out are simply omitted from the prompt.
+    prompt_lines = []
+    if "relevant" in gathered:
+        context_snippet = "\n".join(gathered["relevant"])
+        prompt_lines.append(f"Relevant context: {context_snippet}")
+    if "guidance" in gathered:
+        prompt_lines.append(f"Neuron's guidance: {gathered['guidance']}")
+    prompt_lines.append(f"\nUser: {user_input}\nBot:")
+    combined_prompt = "\n".join(prompt_lines).lstrip("\n")
 
     # Use the pre-initialized AI model
-    response = main_bot.invoke(combined_prompt)
-
-    response_text = response.content
+    response_text, streamed = _generate(combined_prompt, on_token)
     if config.get("use_emoji"):
         response_text += " 😊"
+        if streamed:
+            on_token(" 😊")
 
     try:
         data = json.loads(response_text)
@@ -132,10 +241,12 @@ def handle_user_input(user_input):
             "logic_notes": "",
         }
 
-    # Save conversation context using only the final response
-    memory_cache.add_message(user_input, structured["final_response"])
-    summarizer.summarize_and_store("default", user_input)
-    event_logger.log_event("bot_response", {"text": structured["final_response"]})
+    if on_token is not None and not streamed:
+        on_token(structured["final_response"])
+
+    if use_cache:
+        response_cache.get_cache().put(user_input, structured)
+    _persist_exchange(user_input, structured["final_response"])
     return structured
 
 def chat_loop():
@@ -153,10 +264,17 @@ def chat_loop():
         user_input = input("[SYSTEM_OPERATOR] >> ")
         if user_input.lower() == "exit":
             print("[NEURAL-BOT] >> Exiting secure terminal. Goodbye!")
+            if response_cache.enabled():
+                event_logger.log_event("response_cache", response_cache.stats())
             event_logger.log_event("session_end")
+            ingestion.drain()
             memory_cache.flush()
             break
 
+        # Set once reply tokens have been printed as they streamed in.
+        streamed = []
+        splitter = None
+
         # ✅ Ensure system commands are detected
         if user_input.startswith("!"):
             command = user_input[1:].strip()  # Remove "!" and extra spaces
@@ -176,7 +294,16 @@ def chat_loop():
                     "logic_notes": "",
                 }
             else:
-                bot_response = handle_user_input(user_input)
+                splitter = ThinkSplitter()
+
+                def on_token(chunk):
+                    if not streamed:
+                        print("[NEURAL-BOT] >> ", end="", flush=True)
+                        streamed.append(True)
+                    chat_part, _ = splitter.feed(chunk)
+                    print(chat_part, end="", flush=True)
+
+                bot_response = handle_user_input(user_input, on_token=on_token)
 
         exchange_count += 1
 
@@ -185,8 +312,13 @@ def chat_loop():
             process_memory()
             last_memory_process = time.time()
 
-        print("[NEURAL-BOT] >>", bot_response.get("final_response", ""))
         logic_lines = []
+        if streamed:
+            print(splitter.finish()[0])
+            if splitter.logic_text:
+                logic_lines.append(f"think: {splitter.logic_text}")
+        else:
+            print("[NEURAL-BOT] >>", bot_response.get("final_response", ""))
         for key in ("thought_process", "classifications", "logic_notes"):
             val = bot_response.get(key)
             if val:
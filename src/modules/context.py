@@ -5,16 +5,19 @@ last_command: str | None = None
 last_output: str | None = None
 last_timestamp: float | None = None
 command_history: list[tuple[str | None, str | None, float]] = []
+# Bumped on every recorded command so caches can tell their data is stale.
+generation = 0
 
 
 def set_last(command: str | None, output: str | None) -> None:
     """Store the last executed command, its output, and a timestamp."""
-    global last_command, last_output, last_timestamp, command_history
+    global last_command, last_output, last_timestamp, command_history, generation
     last_command = command
     last_output = output
     last_timestamp = time.time() if command else None
     if command:
         command_history.append((command, output, last_timestamp))
+        generation += 1
 
 
 def get_last() -> tuple[str | None, str | None, float | None]:
@@ -0,0 +1,119 @@
+"""Thread-safe SQLite connections: one shared writer and a pool of readers."""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from .db_utils import WriteScope, configure_connection
+
+
+class ConnectionPool:
+    """Hand out SQLite connections that are safe to use from any thread.
+
+    All writes go through a single connection serialised by a lock, which
+    matches SQLite's one-writer model and avoids ``database is locked``
+    churn. Reads check a connection out of an idle pool, so with WAL
+    journaling readers run in parallel with each other and with the writer.
+    A thread inside :meth:`transaction` reads through the writer so it sees
+    its own uncommitted rows.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        setup: Callable[[sqlite3.Connection], None] | None = None,
+        busy_timeout: float = 5.0,
+        max_idle_readers: int = 4,
+    ) -> None:
+        self.path = str(path)
+        self.busy_timeout = busy_timeout
+        self.max_idle_readers = max_idle_readers
+        self._lock = threading.RLock()
+        self._scope = WriteScope()
+        self._owner: int | None = None
+        self._idle: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._stats = {
+            "readers_opened": 0,
+            "readers_in_use": 0,
+            "reader_checkouts": 0,
+            "write_transactions": 0,
+            "write_waits": 0,
+            "write_wait_seconds": 0.0,
+        }
+        self._writer = self._connect()
+        if setup is not None:
+            setup(self._writer)
+        self._writer.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, check_same_thread=False
+        )
+        configure_connection(conn, busy_timeout=self.busy_timeout)
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Check out a read connection for the duration of the block."""
+        if self._owner == threading.get_ident():
+            yield self._writer
+            return
+        with self._readers_lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._stats["readers_opened"] += 1
+            self._stats["reader_checkouts"] += 1
+            self._stats["readers_in_use"] += 1
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                self._stats["readers_in_use"] -= 1
+                if len(self._idle) < self.max_idle_readers:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    @contextmanager
+    def transaction(
+        self, on_rollback: Callable[[], None] | None = None
+    ) -> Iterator[sqlite3.Connection]:
+        """Hold the writer for the block and commit once at the outermost level."""
+        if not self._lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            self._stats["write_waits"] += 1
+            self._stats["write_wait_seconds"] += time.perf_counter() - start
+        try:
+            outermost = self._owner is None
+            self._owner = threading.get_ident()
+            if outermost:
+                self._stats["write_transactions"] += 1
+            try:
+                with self._scope.transaction(self._writer, on_rollback) as conn:
+                    yield conn
+            finally:
+                if outermost:
+                    self._owner = None
+        finally:
+            self._lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters describing how the pool has been used."""
+        with self._readers_lock:
+            return {"path": self.path, "readers_idle": len(self._idle), **self._stats}
+
+    def close(self) -> None:
+        with self._lock:
+            with self._readers_lock:
+                for conn in self._idle:
+                    conn.close()
+                self._idle.clear()
+            self._writer.close()
@@ -0,0 +1,57 @@
+"""Shared SQLite helpers for the memory and chat databases."""
+
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+def configure_connection(
+    conn: sqlite3.Connection, synchronous: str = "NORMAL", busy_timeout: float = 5.0
+) -> None:
+    """Switch ``conn`` to WAL journaling with a relaxed ``synchronous`` level.
+
+    In WAL mode ``NORMAL`` only syncs at checkpoints, so a commit no longer
+    costs an fsync while the database stays consistent after a crash.
+    ``busy_timeout`` (seconds) makes lock contention wait instead of failing.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+
+
+class WriteScope:
+    """Track nested write batches so only the outermost one commits."""
+
+    def __init__(self) -> None:
+        self.depth = 0
+
+    def commit(self, conn: sqlite3.Connection) -> None:
+        """Commit unless a surrounding :meth:`transaction` is still open."""
+        if not self.depth:
+            conn.commit()
+
+    @contextmanager
+    def transaction(
+        self,
+        conn: sqlite3.Connection,
+        on_rollback: Callable[[], None] | None = None,
+    ) -> Iterator[sqlite3.Connection]:
+        """Run the enclosed writes as a single transaction.
+
+        Nested scopes join the outer transaction. If the block raises, every
+        write since the outermost scope opened is rolled back and
+        ``on_rollback`` is called to drop state derived from them.
+        """
+        self.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self.depth -= 1
+            if not self.depth:
+                conn.rollback()
+                if on_rollback is not None:
+                    on_rollback()
+            raise
+        self.depth -= 1
+        if not self.depth:
+            conn.commit()
@@ -0,0 +1,101 @@
+"""Two-tier cache of text embeddings keyed by model id and content hash.
+
+Lookups hit an in-process LRU first and fall back to a SQLite table next to
+the other stores, so an embedding computed once survives restarts. Entries
+are keyed by ``(model_id, sha1(text))`` so vectors from different models are
+never mixed.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from .db_pool import ConnectionPool
+
+_DB_PATH = Path(__file__).resolve().parent.parent / "models" / "embedding_cache.db"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+        "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+    )
+
+
+class EmbeddingCache:
+    """LRU of ``max_items`` vectors backed by a persistent SQLite store."""
+
+    def __init__(self, path: str | Path | None = None, max_items: int = 4096) -> None:
+        self.max_items = max_items
+        self._pool = ConnectionPool(path or _DB_PATH, setup=_create_schema)
+        self._lru: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _remember(self, key: Tuple[str, str], vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model_id: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors for whichever ``hashes`` are known."""
+        found: Dict[str, List[float]] = {}
+        missing = []
+        with self._lock:
+            for h in hashes:
+                vector = self._lru.get((model_id, h))
+                if vector is None:
+                    missing.append(h)
+                else:
+                    self._lru.move_to_end((model_id, h))
+                    found[h] = vector
+            self._stats["memory_hits"] += len(found)
+        if missing:
+            with self._pool.reader() as conn:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start : start + 500]
+                    rows = conn.execute(
+                        "SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN "
+                        f"({','.join('?' * len(chunk))})",
+                        [model_id, *chunk],
+                    ).fetchall()
+                    for h, blob in rows:
+                        found[h] = array("f", blob).tolist()
+            with self._lock:
+                for h in missing:
+                    if h in found:
+                        self._remember((model_id, h), found[h])
+                        self._stats["disk_hits"] += 1
+                    else:
+                        self._stats["misses"] += 1
+        return found
+
+    def put_many(self, model_id: str, items: Dict[str, List[float]]) -> None:
+        """Store ``{hash: vector}`` in both tiers."""
+        if not items:
+            return
+        with self._lock:
+            for h, vector in items.items():
+                self._remember((model_id, h), vector)
+        with self._pool.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model_id, h, array("f", vector).tobytes()) for h, vector in items.items()],
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"memory_items": len(self._lru), **self._stats}
+
+    def close(self) -> None:
+        self._pool.close()
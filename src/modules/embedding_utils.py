@@ -1,19 +1,168 @@
-import string
-from typing import List
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Sequence, Tuple
+
+from . import hashing_embedder
+from .embedding_cache import EmbeddingCache, text_key
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+FALLBACK_MODEL_ID = hashing_embedder.MODEL_ID
+
+_model: Any = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_model() -> Any:
+    """Return the shared ``SentenceTransformer``, loading it on first use.
+
+    ``None`` means sentence-transformers is unavailable; the failure is
+    remembered so later calls do not retry the import.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                try:
+                    from sentence_transformers import SentenceTransformer
+
+                    _model = SentenceTransformer(MODEL_NAME)
+                except Exception:
+                    logging.info("sentence-transformers unavailable; using fallback embeddings")
+                    _model = None
+                _model_loaded = True
+    return _model
+
+
+class EmbeddingService:
+    """Encode texts on one worker thread, coalescing concurrent requests.
+
+    Callers block on :meth:`encode` while the worker drains every request
+    queued since its last pass, up to ``max_batch`` texts, and runs them
+    through the model as a single batch.
+    """
+
+    def __init__(self, max_batch: int = 64) -> None:
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = get_model().encode(texts).tolist()
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            start = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[start : start + len(request_texts)])
+                start += len(request_texts)
+
+    def encode(self, texts: Sequence[str]) -> List[List[float]]:
+        """Return one embedding per text, in order."""
+        texts = list(texts)
+        if not texts:
+            return []
+        if get_model() is None:
+            return hashing_embedder.embed_many(texts)
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+
+_service: EmbeddingService | None = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> EmbeddingService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
+
+
+def warm_up(background: bool = True) -> threading.Thread | None:
+    """Load the model (and run one encode) ahead of the first real request."""
+    if not background:
+        get_service().encode(["warm up"])
+        return None
+    thread = threading.Thread(target=warm_up, args=(False,), daemon=True)
+    thread.start()
+    return thread
+
+
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def model_id() -> str:
+    """Identify the embedder currently producing vectors.
+
+    Stored vectors are tagged with this id so :mod:`memory_db` never ranks
+    vectors from different embedders against each other.
+    """
+    return MODEL_NAME if get_model() is not None else FALLBACK_MODEL_ID
+
+
+def embed_texts(texts: Sequence[str], batch_size: int = 64) -> List[List[float]]:
+    """Return one embedding per text, encoding only texts not seen before.
+
+    Repeated texts (within the call or cached earlier) cost a hash lookup;
+    the rest are encoded ``batch_size`` at a time. The hashing fallback is
+    cheaper to run than a cache lookup, so its vectors are not cached.
+    """
+    texts = list(texts)
+    model = model_id()
+    if model == FALLBACK_MODEL_ID:
+        return hashing_embedder.embed_many(texts)
+    cache = get_cache()
+    keys = [text_key(text) for text in texts]
+    vectors = cache.get_many(model, set(keys))
+    todo: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            todo.setdefault(key, text)
+    pending = list(todo.items())
+    service = get_service()
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start : start + batch_size]
+        encoded = dict(zip((k for k, _ in chunk), service.encode([t for _, t in chunk])))
+        cache.put_many(model, encoded)
+        vectors.update(encoded)
+    return [vectors[key] for key in keys]
 
 
 def embed_text(text: str) -> List[float]:
     """Return a vector embedding for the given text."""
-    try:
-        from sentence_transformers import SentenceTransformer
-
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        return model.encode(text).tolist()
-    except Exception:
-        # Fallback: simple letter frequency vector
-        counts = [0] * 26
-        for ch in text.lower():
-            if ch in string.ascii_lowercase:
-                counts[ord(ch) - 97] += 1
-        total = sum(counts) or 1
-        return [c / total for c in counts]
+    return embed_texts([text])[0]
@@ -1,8 +1,10 @@
 import os
 import json
+import threading
 from datetime import datetime
 
 EVENT_LOG_FILE = os.path.join(os.path.dirname(__file__), "../models/event_log.json")
+_write_lock = threading.Lock()
 
 
 def _load_events():
@@ -23,17 +25,18 @@ def load_events():
 
 def log_event(event_type: str, details: dict | None = None) -> None:
     """Append a new event entry to the event log."""
-    events = _load_events()
-    events.append(
-        {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "type": event_type,
-            "details": details or {},
-        }
-    )
-    os.makedirs(os.path.dirname(EVENT_LOG_FILE), exist_ok=True)
-    with open(EVENT_LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(events, f, indent=4)
+    with _write_lock:
+        events = _load_events()
+        events.append(
+            {
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "type": event_type,
+                "details": details or {},
+            }
+        )
+        os.makedirs(os.path.dirname(EVENT_LOG_FILE), exist_ok=True)
+        with open(EVENT_LOG_FILE, "w", encoding="utf-8") as f:
+            json.dump(events, f, indent=4)
 
 
 def log_feedback(rating: int | str, notes: str | None = None) -> None:
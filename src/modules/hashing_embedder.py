@@ -0,0 +1,70 @@
+"""Offline text embedder based on feature hashing.
+
+Word unigrams, word bigrams and character trigrams are hashed into ``DIM``
+buckets with a stable hash. A second hash bit picks the sign, so collisions
+cancel out on average instead of piling up. Vectors are L2-normalised,
+which makes cosine similarity track shared vocabulary and spelling. The
+output is deterministic across processes and platforms, so stored vectors
+stay comparable.
+"""
+
+import hashlib
+import math
+import re
+from array import array
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+DIM = 512
+MODEL_ID = f"hashing-ngram-{DIM}-v1"
+
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str) -> Tuple[int, float]:
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % DIM, -1.0 if h >> 63 else 1.0
+
+
+def features(text: str) -> List[str]:
+    """Return the hashed features of ``text``."""
+    words = _WORD.findall(text.lower())
+    feats = [f"w:{w}" for w in words]
+    feats.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"<{w}>"
+        feats.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return feats
+
+
+def embed_many(texts: Sequence[str]) -> List[List[float]]:
+    """Embed every text in ``texts`` as a unit vector of length ``DIM``."""
+    buckets = [[_bucket(f) for f in features(text)] for text in texts]
+    if np is not None:
+        rows = np.repeat(np.arange(len(buckets)), [len(b) for b in buckets])
+        flat = [pair for row in buckets for pair in row]
+        cols = np.fromiter((i for i, _ in flat), dtype=np.int64, count=len(flat))
+        signs = np.fromiter((s for _, s in flat), dtype=np.float64, count=len(flat))
+        matrix = np.bincount(rows * DIM + cols, weights=signs, minlength=len(buckets) * DIM)
+        matrix = matrix.reshape(len(buckets), DIM)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+    vectors = []
+    for row in buckets:
+        vec = array("d", bytes(8 * DIM))
+        for i, sign in row:
+            vec[i] += sign
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        vectors.append([v / norm for v in vec])
+    return vectors
+
+
+def embed(text: str) -> List[float]:
+    return embed_many([text])[0]
@@ -0,0 +1,162 @@
+"""Background pipeline for persistence work that should not delay a reply.
+
+Jobs are spread over a small pool of worker threads, each with a bounded
+queue. Jobs submitted with the same ``key`` always run on the same worker, so
+they keep their submission order; when that worker's queue is full the
+caller waits for room. An unkeyed job whose queue stays full for
+``block_timeout`` seconds runs on the caller's thread instead. Either way
+producers are throttled without dropping work. Pending jobs are drained at
+exit.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List
+
+from config.config_loader import load_neocortex_config
+
+_STOP = object()
+
+
+class IngestionPipeline:
+    """Run submitted callables on ``workers`` background threads."""
+
+    def __init__(self, workers: int = 2, max_pending: int = 256, block_timeout: float = 1.0) -> None:
+        self.workers = max(1, workers)
+        self.block_timeout = block_timeout
+        per_lane = max(1, max_pending // self.workers)
+        self._queues: List[queue.Queue] = [queue.Queue(per_lane) for _ in range(self.workers)]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._next = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "ran_inline": 0, "waited": 0}
+
+    def _start(self) -> None:
+        # Caller holds ``self._lock``.
+        if not self._threads:
+            for q in self._queues:
+                thread = threading.Thread(target=self._run, args=(q,), daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self, q: queue.Queue) -> None:
+        while True:
+            job = q.get()
+            if job is _STOP:
+                return
+            self._execute(*job)
+
+    def _execute(self, fn: Callable, args: tuple, kwargs: Dict[str, Any]) -> None:
+        try:
+            fn(*args, **kwargs)
+            outcome = "completed"
+        except Exception:
+            logging.exception("Background ingestion job %r failed", fn)
+            outcome = "failed"
+        with self._lock:
+            self._stats[outcome] += 1
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    def submit(self, fn: Callable, *args: Any, key: str | None = None, **kwargs: Any) -> None:
+        """Queue ``fn(*args, **kwargs)``; same-``key`` jobs run in order."""
+        with self._lock:
+            self._start()
+            if key is not None:
+                lane = zlib.crc32(key.encode("utf-8")) % self.workers
+            else:
+                lane = self._next
+                self._next = (self._next + 1) % self.workers
+            self._pending += 1
+            self._stats["submitted"] += 1
+        job = (fn, args, kwargs)
+        try:
+            self._queues[lane].put(job, timeout=self.block_timeout)
+            return
+        except queue.Full:
+            pass
+        # Running a keyed job here would overtake older jobs with the same
+        # key, so wait for room unless this is the lane's own worker, which
+        # could never make room.
+        if key is not None and threading.current_thread() is not self._worker_for(lane):
+            with self._lock:
+                self._stats["waited"] += 1
+            self._queues[lane].put(job)
+            return
+        with self._lock:
+            self._stats["ran_inline"] += 1
+        self._execute(fn, args, kwargs)
+
+    def _worker_for(self, lane: int) -> threading.Thread | None:
+        with self._lock:
+            return self._threads[lane] if lane < len(self._threads) else None
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Wait until every submitted job has finished; ``False`` on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float | None = None) -> None:
+        """Drain pending jobs and stop the worker threads."""
+        self.drain(timeout)
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for q, thread in zip(self._queues, threads):
+            q.put(_STOP)
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending": self._pending, **self._stats}
+
+
+_pipeline: IngestionPipeline | None = None
+_pipeline_lock = threading.Lock()
+
+
+def _settings() -> Dict[str, Any]:
+    return load_neocortex_config().get("ingestion", {})
+
+
+def get_pipeline() -> IngestionPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            settings = _settings()
+            _pipeline = IngestionPipeline(
+                workers=settings.get("workers", 2),
+                max_pending=settings.get("max_pending", 256),
+                block_timeout=settings.get("block_timeout_seconds", 1.0),
+            )
+        return _pipeline
+
+
+def submit(fn: Callable, *args: Any, key: str | None = None, **kwargs: Any) -> None:
+    """Run ``fn`` in the background, or inline when ingestion is disabled."""
+    if not _settings().get("enabled", True):
+        fn(*args, **kwargs)
+        return
+    get_pipeline().submit(fn, *args, key=key, **kwargs)
+
+
+def drain(timeout: float | None = None) -> bool:
+    """Wait for queued background work, if any was ever submitted."""
+    if _pipeline is None:
+        return True
+    return _pipeline.drain(timeout)
+
+
+atexit.register(drain, 30.0)
@@ -1,17 +1,43 @@
 """Re-embed knowledge sources whenever files change."""
 
+import logging
 import os
 from modules import summarizer
 
+BATCH_SIZE = 256
 
-def reindex_directory(path: str) -> None:
+
+def _read_files(path: str):
     for root, _dirs, files in os.walk(path):
         for name in files:
             file_path = os.path.join(root, name)
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                summarizer.summarize_and_store("kb", content)
+                    yield file_path, f.read()
             except Exception:
-                pass
+                logging.warning("Skipping unreadable knowledge file %s", file_path, exc_info=True)
+
 
+def _store(batch) -> None:
+    """Store ``(path, content)`` pairs, retrying one file at a time on failure."""
+    try:
+        summarizer.summarize_and_store_many("kb", [content for _path, content in batch])
+        return
+    except Exception:
+        if len(batch) == 1:
+            logging.warning("Could not index knowledge file %s", batch[0][0], exc_info=True)
+            return
+        logging.warning("Indexing a batch of %d files failed; retrying one by one", len(batch))
+    for item in batch:
+        _store([item])
+
+
+def reindex_directory(path: str) -> None:
+    batch = []
+    for item in _read_files(path):
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            _store(batch)
+            batch = []
+    if batch:
+        _store(batch)
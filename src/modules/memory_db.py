@@ -1,38 +1,222 @@
+import atexit
+import hashlib
 import json
+import logging
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from config.config_loader import load_neocortex_config
+from . import ann_index
+from .db_pool import ConnectionPool
+from .vector_index import HAS_NUMPY, MappedIndex, QuantizedIndex, VectorIndex, quantize
+
+logger = logging.getLogger(__name__)
 
 _DB_PATH = Path(__file__).resolve().parent.parent / "models" / "memory_store.db"
-_connection: sqlite3.Connection | None = None
-
-
-def _get_conn() -> sqlite3.Connection:
-    global _connection
-    if _connection is None:
-        _connection = sqlite3.connect(_DB_PATH)
-        _connection.execute(
-            """CREATE TABLE IF NOT EXISTS memory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            timestamp TEXT,
-            raw_input TEXT,
-            summary TEXT,
-            embedding TEXT,
-            tags TEXT
-        )"""
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+# Vector and ANN indexes keyed by embedding model; ``None`` covers every row.
+_indexes: Dict[str | None, VectorIndex] = {}
+_index_lock = threading.RLock()
+_anns: Dict[str | None, ann_index.IVFIndex] = {}
+_ann_unsaved: Dict[str | None, int] = {}
+# Background threads training an IVF index, by model.
+_ann_builds: Dict[str | None, threading.Thread] = {}
+_fts_ready = False
+_models: set | None = None
+_users: set | None = None
+_pending_access: Dict[int, str] = {}
+_access_lock = threading.Lock()
+
+ACCESS_FLUSH_SIZE = 256
+
+# Embedders that wrote rows before the ``model`` column existed, by dimension.
+_LEGACY_MODELS = {26: "letter-frequency-26", 384: "all-MiniLM-L6-v2"}
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS memory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        timestamp TEXT,
+        raw_input TEXT,
+        summary TEXT,
+        embedding TEXT,
+        tags TEXT
+    )"""
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS memory_meta (key TEXT PRIMARY KEY, value INTEGER)"
+    )
+    conn.execute("INSERT OR IGNORE INTO memory_meta (key, value) VALUES ('generation', 0)")
+    _ensure_column(conn, "memory", "embedding_q", "BLOB")
+    _ensure_column(conn, "memory", "embedding_scale", "REAL")
+    _ensure_column(conn, "memory", "hits", "INTEGER NOT NULL DEFAULT 1")
+    _ensure_column(conn, "memory", "last_accessed", "TEXT")
+    if _ensure_column(conn, "memory", "model", "TEXT"):
+        for dim, model in _LEGACY_MODELS.items():
+            conn.execute(
+                "UPDATE memory SET model = ? WHERE json_array_length(embedding) = ?",
+                (model, dim),
+            )
+    if _ensure_column(conn, "memory", "content_hash", "TEXT"):
+        rows = conn.execute("SELECT id, raw_input FROM memory").fetchall()
+        conn.executemany(
+            "UPDATE memory SET content_hash = ? WHERE id = ?",
+            [(_content_hash(raw or ""), entry_id) for entry_id, raw in rows],
+        )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_memory_user_hash ON memory (user_id, content_hash)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_memory_user_time ON memory (user_id, timestamp)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_time ON memory (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_model ON memory (model)")
+    has_tag_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='memory_tags'"
+    ).fetchone()
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS memory_tags (
+        tag TEXT NOT NULL,
+        memory_id INTEGER NOT NULL,
+        PRIMARY KEY (tag, memory_id)
+    ) WITHOUT ROWID"""
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_memory_tags_id ON memory_tags (memory_id)"
+    )
+    if not has_tag_table:
+        # Older stores only kept tags as JSON; normalise them once.
+        conn.execute(
+            "INSERT OR IGNORE INTO memory_tags (tag, memory_id) "
+            "SELECT j.value, m.id FROM memory m, json_each(m.tags) j"
+        )
+    _create_fts(conn)
+
+
+def _generation(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT value FROM memory_meta WHERE key='generation'").fetchone()[0]
+
+
+def _bump_generation(conn: sqlite3.Connection) -> None:
+    """Record that rows were removed or rewritten so sidecar indexes rebuild."""
+    conn.execute("UPDATE memory_meta SET value = value + 1 WHERE key='generation'")
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> bool:
+    """Add ``column`` to ``table`` when an older database lacks it.
+
+    Returns ``True`` if the column was added.
+    """
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column in existing:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+def _create_fts(conn: sqlite3.Connection) -> None:
+    """Create the FTS5 index over ``raw_input``/``summary`` and its triggers."""
+    global _fts_ready
+    _fts_ready = _has_fts(conn)
+    if _fts_ready:
+        return
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE memory_fts USING fts5("
+            "raw_input, summary, content='memory', content_rowid='id')"
         )
-        _connection.commit()
-    return _connection
+    except sqlite3.OperationalError as e:
+        logger.warning("FTS5 unavailable, keyword search disabled: %s", e)
+        return
+    conn.executescript(
+        """
+        CREATE TRIGGER IF NOT EXISTS memory_fts_insert AFTER INSERT ON memory BEGIN
+            INSERT INTO memory_fts (rowid, raw_input, summary)
+            VALUES (new.id, new.raw_input, new.summary);
+        END;
+        CREATE TRIGGER IF NOT EXISTS memory_fts_delete AFTER DELETE ON memory BEGIN
+            INSERT INTO memory_fts (memory_fts, rowid, raw_input, summary)
+            VALUES ('delete', old.id, old.raw_input, old.summary);
+        END;
+        CREATE TRIGGER IF NOT EXISTS memory_fts_update
+        AFTER UPDATE OF raw_input, summary ON memory BEGIN
+            INSERT INTO memory_fts (memory_fts, rowid, raw_input, summary)
+            VALUES ('delete', old.id, old.raw_input, old.summary);
+            INSERT INTO memory_fts (rowid, raw_input, summary)
+            VALUES (new.id, new.raw_input, new.summary);
+        END;
+        """
+    )
+    conn.execute("INSERT INTO memory_fts (memory_fts) VALUES ('rebuild')")
+    _fts_ready = True
+
+
+def _has_fts(conn: sqlite3.Connection) -> bool:
+    return bool(
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='memory_fts'"
+        ).fetchone()
+    )
+
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(_DB_PATH, setup=_create_schema)
+        return _pool
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return connection pool counters for the memory store."""
+    return _get_pool().stats()
 
 
 def init_db(db_path: str | None = None) -> None:
     """Initialise the database (for testing or custom location)."""
-    global _connection, _DB_PATH
+    global _pool, _DB_PATH, _models, _users
     if db_path:
+        save_ann_index()
+        if _pool is not None:
+            flush_access_log()
+            _pool.close()
         _DB_PATH = Path(db_path)
-        _connection = None
-    _get_conn()
+        _pool = None
+        _indexes.clear()
+        _anns.clear()
+        _ann_unsaved.clear()
+        _ann_builds.clear()
+        _models = None
+        _users = None
+    _get_pool()
+
+
+def _settings(section: str) -> Dict[str, Any]:
+    return load_neocortex_config().get("memory_store", {}).get(section, {})
+
+
+def _ann_settings() -> Dict[str, Any]:
+    return _settings("ann")
+
+
+def _model_slug(model: str | None) -> str:
+    """Return a file-name-safe tag for ``model``; empty for the all-rows index."""
+    if model is None:
+        return ""
+    readable = re.sub(r"[^A-Za-z0-9]+", "-", model).strip("-")[:40]
+    return f"-{readable}-{hashlib.sha1(model.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _ann_path(model: str | None = None) -> Path:
+    return _DB_PATH.with_suffix(f".ivf{_model_slug(model)}.npz")
 
 
 def add_entry(
@@ -42,52 +226,803 @@ def add_entry(
     summary: str,
     embedding: List[float],
     tags: List[str] | None = None,
+    model: str | None = None,
+) -> int:
+    return add_entries([(user_id, timestamp, raw_input, summary, embedding, tags, model)])[0]
+
+
+def _content_hash(text: str) -> str:
+    """Hash ``text`` ignoring case and whitespace differences."""
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def _word_overlap(a: str, b: str) -> float:
+    words_a, words_b = set(a.lower().split()), set(b.lower().split())
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _find_duplicate(
+    conn: sqlite3.Connection,
+    user_id: str,
+    content_hash: str,
+    raw_input: str,
+    embedding: List[float],
+    model: str | None,
+    settings: Dict[str, Any],
+) -> int | None:
+    """Return the id of an existing entry ``raw_input`` duplicates, if any.
+
+    An identical normalised text for the same user and model matches. Otherwise
+    the ``candidates`` nearest stored vectors are checked against
+    ``similarity_threshold``; a candidate must also belong to the same user
+    and embedding ``model`` and share ``min_word_overlap`` of its words, which
+    stops weak embedders from merging unrelated text.
+    """
+    # The unary ``+`` keeps SQLite on the (user_id, content_hash) index; the
+    # model index would make every insert scan all of that model's rows.
+    row = conn.execute(
+        "SELECT id FROM memory WHERE user_id IS ? AND content_hash = ? AND +model IS ? LIMIT 1",
+        (user_id, content_hash, model),
+    ).fetchone()
+    if row:
+        return row[0]
+    threshold = settings.get("similarity_threshold", 0.97)
+    # Rows of other users or embedders are filtered out after the search; a
+    # wider top-k keeps them from crowding out a real duplicate. Filtering
+    # the index by id first would cost a scan of the user's rows per insert.
+    index = _get_index(_index_key(model))
+    sole_owner = not _store_users() - {user_id} and not _store_models() - {model}
+    k = 5 if sole_owner else settings.get("candidates", 50)
+    hits = [(i, score) for i, score in index.search(embedding, k) if score >= threshold]
+    if not hits:
+        return None
+    rows = conn.execute(
+        "SELECT id, user_id, raw_input, model FROM memory "
+        f"WHERE id IN ({','.join('?' * len(hits))})",
+        [i for i, _score in hits],
+    ).fetchall()
+    texts = {row[0]: row[1:] for row in rows}
+    min_overlap = settings.get("min_word_overlap", 0.5)
+    for entry_id, _score in hits:
+        owner, text, row_model = texts.get(entry_id, (None, "", None))
+        if (
+            owner == user_id
+            and row_model == model
+            and _word_overlap(raw_input, text or "") >= min_overlap
+        ):
+            return entry_id
+    return None
+
+
+def add_entries(entries: Iterable[Sequence[Any]]) -> List[int]:
+    """Insert many entries with ``executemany`` and a single commit.
+
+    Each entry is a ``(user_id, timestamp, raw_input, summary, embedding,
+    tags, model)`` tuple, matching the arguments of :func:`add_entry`;
+    trailing fields may be omitted. Returns the row id for each entry in
+    order.
+
+    Unless ``memory_store.dedup`` is disabled, an entry that duplicates an
+    existing memory of the same user is merged into it: the stored row's
+    ``hits`` counter and timestamp are bumped and its id is returned instead
+    of inserting a new row.
+    """
+    entries = [tuple(e) + (None,) * (7 - len(e)) for e in entries]
+    if not entries:
+        return []
+    dedup = _settings("dedup")
+    with transaction() as conn, _index_lock:
+        ids: List[int | None] = [None] * len(entries)
+        fresh: List[Tuple[int, Tuple[Any, ...], str]] = []
+        hits: List[int] = []
+        batch_rows: Dict[Tuple[Any, Any, str], int] = {}
+        same_as: Dict[int, int] = {}
+        for pos, entry in enumerate(entries):
+            user_id, timestamp, raw_input, _summary, embedding, _tags, model = entry
+            digest = _content_hash(raw_input or "")
+            if dedup.get("enabled", True):
+                if (user_id, model, digest) in batch_rows:
+                    same_as[pos] = batch_rows[(user_id, model, digest)]
+                    hits[same_as[pos]] += 1
+                    continue
+                existing = _find_duplicate(
+                    conn, user_id, digest, raw_input or "", embedding, model, dedup
+                )
+                if existing is not None:
+                    conn.execute(
+                        "UPDATE memory SET hits = hits + 1, timestamp = ? WHERE id = ?",
+                        (timestamp, existing),
+                    )
+                    ids[pos] = existing
+                    continue
+            batch_rows[(user_id, model, digest)] = len(fresh)
+            fresh.append((pos, entry, digest))
+            hits.append(1)
+        if fresh:
+            _insert_rows(conn, fresh, hits, ids)
+        for pos, fresh_index in same_as.items():
+            ids[pos] = ids[fresh[fresh_index][0]]
+    return ids
+
+
+def _insert_rows(
+    conn: sqlite3.Connection,
+    fresh: List[Tuple[int, Tuple[Any, ...], str]],
+    hits: List[int],
+    ids: List[int | None],
 ) -> None:
-    conn = _get_conn()
-    conn.execute(
-        "INSERT INTO memory (user_id, timestamp, raw_input, summary, embedding, tags) VALUES (?, ?, ?, ?, ?, ?)",
-        (
-            user_id,
-            timestamp,
-            raw_input,
-            summary,
-            json.dumps(embedding),
-            json.dumps(tags or []),
-        ),
+    # The int8 columns only serve the quantized index; without it they would
+    # cost a quantization per row for nothing, and are filled in on first load.
+    quantized = _settings("quantization").get("enabled")
+    conn.executemany(
+        "INSERT INTO memory (user_id, timestamp, raw_input, summary, embedding, tags, "
+        "embedding_q, embedding_scale, content_hash, hits, model) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                user_id,
+                timestamp,
+                raw_input,
+                summary,
+                json.dumps(embedding),
+                json.dumps(tags or []),
+                *(quantize(embedding) if quantized else (None, None)),
+                digest,
+                count,
+                model,
+            )
+            for (_pos, (user_id, timestamp, raw_input, summary, embedding, tags, model), digest),
+            count in zip(fresh, hits)
+        ],
+    )
+    # The write lock is held, so the AUTOINCREMENT ids are contiguous.
+    last = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='memory'").fetchone()[0]
+    new_ids = list(range(last - len(fresh) + 1, last + 1))
+    conn.executemany(
+        "INSERT OR IGNORE INTO memory_tags (tag, memory_id) VALUES (?, ?)",
+        [(tag, entry_id) for entry_id, (_p, e, _d) in zip(new_ids, fresh) for tag in e[5] or []],
     )
-    conn.commit()
+    for entry_id, (pos, _entry, _digest) in zip(new_ids, fresh):
+        ids[pos] = entry_id
+    if _models is not None:
+        _models.update(e[6] for _p, e, _d in fresh)
+    if _users is not None:
+        _users.update(e[0] for _p, e, _d in fresh)
+    for key, index in _indexes.items():
+        rows = [
+            (entry_id, e[4])
+            for entry_id, (_p, e, _d) in zip(new_ids, fresh)
+            if key is None or e[6] == key
+        ]
+        if rows:
+            index.add_many(rows)
+            if key in _anns:
+                _add_to_ann(key, [entry_id for entry_id, _v in rows])
 
 
-def _all_entries() -> List[Dict[str, Any]]:
-    conn = _get_conn()
-    cur = conn.execute(
-        "SELECT user_id, timestamp, raw_input, summary, embedding, tags FROM memory"
-    )
-    entries = []
-    for row in cur.fetchall():
-        entries.append(
-            {
-                "user_id": row[0],
-                "timestamp": row[1],
-                "raw_input": row[2],
-                "summary": row[3],
-                "embedding": json.loads(row[4]),
-                "tags": json.loads(row[5]),
-            }
+def _discard_caches() -> None:
+    """Forget derived indexes after a rollback; they are rebuilt on demand."""
+    global _models, _users
+    with _index_lock:
+        for index in _indexes.values():
+            if isinstance(index, MappedIndex):
+                index.invalidate()
+        _indexes.clear()
+        _anns.clear()
+        _ann_unsaved.clear()
+        _models = None
+        _users = None
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Group every write in the block into one commit.
+
+    ``add_entry`` and ``add_entries`` calls inside the block join the
+    transaction instead of committing on their own.
+    """
+    with _get_pool().transaction(on_rollback=_discard_caches) as conn:
+        yield conn
+
+
+def _add_to_ann(model: str | None, ids: List[int]) -> None:
+    index = _indexes[model]
+    _anns[model].add_many(ids, index.rows(index.positions(ids)))
+    _ann_unsaved[model] = _ann_unsaved.get(model, 0) + len(ids)
+    if _ann_unsaved[model] >= _ann_settings().get("save_every", 1000):
+        save_ann_index()
+
+
+def _index_key(model: str | None) -> str | None:
+    """Return which index serves queries for ``model``.
+
+    While every stored row comes from ``model`` the all-rows index is used,
+    so a single-embedder store keeps one index.
+    """
+    if model is not None and not _store_models() - {model}:
+        return None
+    return model
+
+
+def _get_index(model: str | None = None) -> VectorIndex:
+    """Return the cached embedding matrix for ``model``, loading it once.
+
+    ``model=None`` indexes every row; otherwise only that embedder's rows
+    are loaded, so its queries never need a model filter.
+    """
+    with _index_lock:
+        index = _indexes.get(model)
+        if index is None:
+            index = _build_index(model)
+            _indexes[model] = index
+            if _ann_settings().get("enabled") and ann_index.available():
+                _load_ann_index(model)
+        return index
+
+
+def _build_index(model: str | None) -> VectorIndex:
+    """Load a new index of the configured kind for ``model``'s rows."""
+    quantization = _settings("quantization")
+    if quantization.get("enabled") and HAS_NUMPY:
+        index = QuantizedIndex(_fetch_embeddings, oversample=quantization.get("oversample", 4))
+        _load_quantized(index, model)
+    elif _settings("mmap").get("enabled", True) and HAS_NUMPY:
+        index = _open_mapped(model)
+    else:
+        index = VectorIndex()
+        _load_rows(index, model=model)
+    return index
+
+
+def _model_clause(model: str | None) -> Tuple[str, List[Any]]:
+    return ("", []) if model is None else (" AND model = ?", [model])
+
+
+def _load_rows(index: VectorIndex, after_id: int = 0, model: str | None = None) -> None:
+    clause, params = _model_clause(model)
+    with _get_pool().reader() as conn:
+        cur = conn.execute(
+            f"SELECT id, embedding FROM memory WHERE id > ?{clause} ORDER BY id",
+            (after_id, *params),
         )
-    return entries
+        while True:
+            rows = cur.fetchmany(1000)
+            if not rows:
+                break
+            index.add_many((row[0], json.loads(row[1])) for row in rows)
 
 
-def search(query_embedding: List[float], k: int = 5) -> List[Dict[str, Any]]:
-    """Return up to ``k`` entries sorted by dot-product similarity."""
-    entries = _all_entries()
-    if not entries:
+def _open_mapped(model: str | None = None) -> MappedIndex:
+    """Map the embedding sidecar, rebuilding or catching it up as needed.
+
+    The sidecar is trusted only if it was written for the current database
+    generation and holds no id the database does not; rows inserted since it
+    was last appended to are replayed from SQLite.
+    """
+    index = MappedIndex(_DB_PATH, 0, name="vectors" + _model_slug(model))
+    # Hold the sidecar lock so no other writer appends between the check
+    # and the catch-up.
+    with index.locked():
+        with _get_pool().reader() as conn:
+            index.generation = _generation(conn)
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM memory").fetchone()[0]
+        if not index.open() or index.last_id > max_id:
+            index.reset()
+        _load_rows(index, after_id=index.last_id, model=model)
+    return index
+
+
+def _load_quantized(index: QuantizedIndex, model: str | None = None) -> None:
+    """Fill ``index`` from the int8 column, quantizing rows that predate it."""
+    clause, params = _model_clause(model)
+    with _get_pool().reader() as conn:
+        cur = conn.execute(
+            "SELECT id, embedding_q, embedding_scale, "
+            "CASE WHEN embedding_q IS NULL THEN embedding END FROM memory "
+            f"WHERE 1{clause} ORDER BY id",
+            params,
+        )
+        while True:
+            rows = cur.fetchmany(1000)
+            if not rows:
+                break
+            index.add_quantized(
+                (row[0], row[1], row[2]) if row[1] is not None
+                else (row[0], *quantize(json.loads(row[3])))
+                for row in rows
+            )
+
+
+def _fetch_embeddings(ids: List[int]) -> Dict[int, List[float]]:
+    """Return full-precision embeddings for ``ids`` (used for rescoring)."""
+    if not ids:
+        return {}
+    with _get_pool().reader() as conn:
+        rows = conn.execute(
+            f"SELECT id, embedding FROM memory WHERE id IN ({','.join('?' * len(ids))})",
+            ids,
+        ).fetchall()
+    return {row[0]: json.loads(row[1]) for row in rows}
+
+
+def _load_ann_index(model: str | None = None) -> None:
+    """Load the persisted IVF index and file in rows added since it was saved."""
+    path = _ann_path(model)
+    if not path.exists():
+        return
+    try:
+        ann = ann_index.IVFIndex.load(path)
+    except Exception as e:
+        logger.warning("Ignoring unreadable ANN index %s: %s", path, e)
+        return
+    _catch_up_ann(ann, model)
+    _anns[model] = ann
+
+
+def _catch_up_ann(ann: ann_index.IVFIndex, model: str | None) -> None:
+    """File rows of ``model``'s index that are newer than ``ann`` into it."""
+    index = _indexes[model]
+    new_ids = [i for i in index.ids() if i > ann.max_id]
+    if new_ids:
+        ann.add_many(new_ids, index.rows(index.positions(new_ids)))
+
+
+def build_ann_index(
+    nlist: int | None = None, nprobe: int | None = None, model: str | None = None
+) -> ann_index.IVFIndex:
+    """Train an IVF index over the stored embeddings and persist it.
+
+    ``nlist`` defaults to roughly ``sqrt(n)`` clusters. ``nprobe`` sets how
+    many clusters a query scans by default; more clusters means higher recall
+    and higher latency. ``model`` builds the index over that embedder's rows
+    only, as used by searches passing the same ``model``.
+    """
+    if not ann_index.available():
+        raise RuntimeError("NumPy is required for the ANN index")
+    with _index_lock:
+        index = _get_index(model)
+        if not len(index):
+            raise ValueError("Cannot build an ANN index over an empty store")
+        settings = _ann_settings()
+        ann = ann_index.IVFIndex.build(
+            index.ids(),
+            index.rows(),
+            nlist=nlist or settings.get("nlist"),
+            nprobe=nprobe or settings.get("nprobe", 8),
+        )
+        _anns[model] = ann
+        _ann_unsaved[model] = 0
+        ann.save(_ann_path(model))
+        return ann
+
+
+def save_ann_index() -> None:
+    """Write pending ANN inserts next to the database."""
+    with _index_lock:
+        for model, ann in _anns.items():
+            if _ann_unsaved.get(model):
+                ann.save(_ann_path(model))
+                _ann_unsaved[model] = 0
+
+
+atexit.register(save_ann_index)
+
+
+def _get_ann(index: VectorIndex, model: str | None = None) -> ann_index.IVFIndex | None:
+    """Return ``model``'s IVF index, or ``None`` to search exactly.
+
+    Once the store reaches ``min_entries`` the index is trained on a
+    background thread; searches keep running exactly until it is ready.
+    """
+    ann = _anns.get(model)
+    if ann is not None:
+        return ann
+    settings = _ann_settings()
+    if not settings.get("enabled") or not ann_index.available():
+        return None
+    if len(index) >= settings.get("min_entries", 100000):
+        with _index_lock:
+            build = _ann_builds.get(model)
+            if build is None or not build.is_alive():
+                build = threading.Thread(target=_train_ann, args=(model,), daemon=True)
+                _ann_builds[model] = build
+                build.start()
+    return None
+
+
+def _train_ann(model: str | None) -> None:
+    """Train ``model``'s IVF index off the index lock, then install it."""
+    settings = _ann_settings()
+    with _index_lock:
+        index = _indexes.get(model)
+        if index is None or model in _anns:
+            return
+        # Rows are only ever appended, so this prefix stays valid unlocked.
+        ids, rows = index.ids(), index.rows()
+    try:
+        ann = ann_index.IVFIndex.build(
+            ids, rows, nlist=settings.get("nlist"), nprobe=settings.get("nprobe", 8)
+        )
+    except Exception:
+        logger.exception("Training the ANN index failed")
+        return
+    with _index_lock:
+        # Retention may have swapped in a new index (and ANN) meanwhile.
+        if _indexes.get(model) is not index or model in _anns:
+            return
+        _catch_up_ann(ann, model)
+        _anns[model] = ann
+        _ann_unsaved[model] = 0
+        ann.save(_ann_path(model))
+
+
+def _row_to_entry(row: tuple) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "timestamp": row[2],
+        "raw_input": row[3],
+        "summary": row[4],
+        "embedding": json.loads(row[5]),
+        "tags": json.loads(row[6]),
+        "hits": row[7],
+    }
+
+
+def _fetch_entries(ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    with _get_pool().reader() as conn:
+        rows = conn.execute(
+            "SELECT id, user_id, timestamp, raw_input, summary, embedding, tags, hits "
+            f"FROM memory WHERE id IN ({placeholders})",
+            ids,
+        ).fetchall()
+    return {row[0]: _row_to_entry(row) for row in rows}
+
+
+def _filter_sql(
+    user_id: str | None,
+    tags: Iterable[str] | None,
+    since: str | None,
+    until: str | None,
+    model: str | None = None,
+) -> Tuple[List[str], List[Any]]:
+    """Build ``WHERE`` clauses over the ``memory m`` alias for the filters."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    if model is not None:
+        clauses.append("m.model = ?")
+        params.append(model)
+    if user_id is not None:
+        clauses.append("m.user_id = ?")
+        params.append(user_id)
+    if since is not None:
+        clauses.append("m.timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("m.timestamp <= ?")
+        params.append(until)
+    tags = list(tags or [])
+    if tags:
+        clauses.append(
+            "m.id IN (SELECT memory_id FROM memory_tags WHERE tag IN "
+            f"({','.join('?' * len(tags))}))"
+        )
+        params.extend(tags)
+    return clauses, params
+
+
+def _filtered_ids(
+    user_id: str | None,
+    tags: Iterable[str] | None,
+    since: str | None,
+    until: str | None,
+    model: str | None = None,
+) -> List[int]:
+    """Return ids matching the metadata filters using the SQLite indexes."""
+    clauses, params = _filter_sql(user_id, tags, since, until, model)
+    sql = "SELECT m.id FROM memory m"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY m.id"
+    with _get_pool().reader() as conn:
+        return [row[0] for row in conn.execute(sql, params).fetchall()]
+
+
+def _hits_to_entries(hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+    entries = _fetch_entries([entry_id for entry_id, _score in hits])
+    results = []
+    for entry_id, score in hits:
+        entry = entries.get(entry_id)
+        if entry is not None:
+            entry["score"] = score
+            results.append(entry)
+    _record_access([entry["id"] for entry in results])
+    return results
+
+
+def _record_access(ids: List[int]) -> None:
+    """Remember when entries were last retrieved, for LRU eviction.
+
+    Updates are buffered and written in one batch so a search does not
+    cost a commit.
+    """
+    if not ids:
+        return
+    now = datetime.utcnow().isoformat() + "Z"
+    with _access_lock:
+        for entry_id in ids:
+            _pending_access[entry_id] = now
+        flush = len(_pending_access) >= ACCESS_FLUSH_SIZE
+    if flush:
+        flush_access_log()
+
+
+def flush_access_log() -> None:
+    """Write buffered ``last_accessed`` timestamps to the database."""
+    with _access_lock:
+        pending = list(_pending_access.items())
+        _pending_access.clear()
+    if pending:
+        with transaction() as conn:
+            conn.executemany(
+                "UPDATE memory SET last_accessed = ? WHERE id = ?",
+                [(ts, entry_id) for entry_id, ts in pending],
+            )
+
+
+atexit.register(flush_access_log)
+
+
+def _store_models() -> set:
+    """Return the embedding model ids present in the store (cached)."""
+    global _models
+    with _index_lock:
+        if _models is None:
+            with _get_pool().reader() as conn:
+                _models = {row[0] for row in conn.execute("SELECT DISTINCT model FROM memory")}
+        return _models
+
+
+def _store_users() -> set:
+    """Return the user ids present in the store (cached)."""
+    global _users
+    with _index_lock:
+        if _users is None:
+            with _get_pool().reader() as conn:
+                _users = {row[0] for row in conn.execute("SELECT DISTINCT user_id FROM memory")}
+        return _users
+
+
+def _vector_hits(
+    query_embedding: List[float],
+    k: int,
+    nprobe: int | None,
+    user_id: str | None,
+    tags: Iterable[str] | None,
+    since: str | None,
+    until: str | None,
+    model: str | None = None,
+) -> List[Tuple[int, float]]:
+    # The model's own index holds only its rows, so no model filter is needed.
+    key = _index_key(model)
+    index = _get_index(key)
+    if any(f is not None for f in (user_id, since, until)) or tags:
+        candidates = _filtered_ids(user_id, tags, since, until)
+        return index.search(query_embedding, k, ids=candidates)
+    ann = _get_ann(index, key)
+    if ann is not None:
+        candidates = ann.candidates(index.query_vector(query_embedding), nprobe)
+        return index.search(query_embedding, k, ids=candidates)
+    return index.search(query_embedding, k)
+
+
+def search(
+    query_embedding: List[float],
+    k: int = 5,
+    nprobe: int | None = None,
+    user_id: str | None = None,
+    tags: Iterable[str] | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    model: str | None = None,
+) -> List[Dict[str, Any]]:
+    """Return up to ``k`` entries sorted by cosine similarity.
+
+    Scoring runs against the cached embedding matrix so only the ``k``
+    winning rows are read back from SQLite. Once the ANN index is enabled and
+    built, only the entries in the ``nprobe`` nearest clusters are scored.
+
+    ``user_id``, ``tags`` (entries carrying any of them) and the ISO
+    ``since``/``until`` window are resolved in SQL first, so a filtered query
+    only scores the matching rows. Passing the embedder's ``model`` id keeps
+    vectors from other embedders out of the ranking.
+    """
+    hits = _vector_hits(query_embedding, k, nprobe, user_id, tags, since, until, model)
+    return _hits_to_entries(hits)
+
+
+def _match_expression(text: str) -> str:
+    """Quote each term of ``text`` as an FTS5 phrase joined with ``OR``.
+
+    Quoting keeps IPs, CVE ids and hostnames intact as token sequences and
+    stops punctuation from being parsed as query syntax.
+    """
+    terms = []
+    for term in text.split():
+        if any(ch.isalnum() for ch in term):
+            terms.append('"' + term.replace('"', '""') + '"')
+    return " OR ".join(terms)
+
+
+def keyword_search(
+    query: str,
+    k: int = 5,
+    user_id: str | None = None,
+    tags: Iterable[str] | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> List[Dict[str, Any]]:
+    """Return up to ``k`` entries ranked by BM25 over raw input and summary."""
+    return _hits_to_entries(_keyword_hits(query, k, user_id, tags, since, until))
+
+
+def _keyword_hits(
+    query: str,
+    k: int,
+    user_id: str | None,
+    tags: Iterable[str] | None,
+    since: str | None,
+    until: str | None,
+) -> List[Tuple[int, float]]:
+    expression = _match_expression(query)
+    if not expression or not _fts_ready:
         return []
+    clauses, params = _filter_sql(user_id, tags, since, until)
+    sql = (
+        "SELECT m.id, bm25(memory_fts) FROM memory_fts "
+        "JOIN memory m ON m.id = memory_fts.rowid WHERE memory_fts MATCH ?"
+    )
+    for clause in clauses:
+        sql += " AND " + clause
+    sql += " ORDER BY bm25(memory_fts) LIMIT ?"
+    with _get_pool().reader() as conn:
+        rows = conn.execute(sql, [expression, *params, k]).fetchall()
+    # bm25() is lower-is-better; flip it so every search returns higher-is-better.
+    return [(row[0], -row[1]) for row in rows]
+
+
+def hybrid_search(
+    query: str,
+    query_embedding: List[float],
+    k: int = 5,
+    user_id: str | None = None,
+    tags: Iterable[str] | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    rrf_k: int = 60,
+    model: str | None = None,
+) -> List[Dict[str, Any]]:
+    """Fuse keyword and vector rankings with reciprocal rank fusion.
+
+    Each list contributes ``1 / (rrf_k + rank)`` per entry, so exact term
+    matches surface even when the embedding is weak, and semantic matches
+    still rank when no term overlaps. ``model`` restricts the vector
+    ranking as in :func:`search`.
+    """
+    depth = max(k * 4, 20)
+    filters = dict(user_id=user_id, tags=tags, since=since, until=until)
+    vector = _vector_hits(query_embedding, depth, None, model=model, **filters)
+    lexical = _keyword_hits(query, depth, **filters)
+    fused: Dict[int, float] = {}
+    for ranking in (lexical, vector):
+        for rank, (entry_id, _score) in enumerate(ranking, start=1):
+            fused[entry_id] = fused.get(entry_id, 0.0) + 1.0 / (rrf_k + rank)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return _hits_to_entries(best)
+
+
+def _cutoff(days: float) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).isoformat() + "Z"
+
+
+def apply_retention(
+    max_rows_per_user: int | None = None,
+    tag_ttl_days: Dict[str, float] | None = None,
+    max_idle_days: float | None = None,
+) -> int:
+    """Delete memories that fall outside the retention rules.
+
+    * ``tag_ttl_days`` maps a tag to how long entries carrying it are kept.
+    * ``max_idle_days`` evicts entries not retrieved (or stored) recently.
+    * ``max_rows_per_user`` keeps only each user's most recently used rows.
+
+    Recency is ``last_accessed`` falling back to ``timestamp``. Returns the
+    number of rows removed. The loaded vector indexes, and the ANN index when
+    enabled, are rebuilt before returning.
+    """
+    flush_access_log()
+    recency = "COALESCE(m.last_accessed, m.timestamp)"
+    queries: List[Tuple[str, List[Any]]] = []
+    for tag, days in (tag_ttl_days or {}).items():
+        queries.append(
+            (
+                "SELECT m.id FROM memory m JOIN memory_tags t ON t.memory_id = m.id "
+                "WHERE t.tag = ? AND m.timestamp < ?",
+                [tag, _cutoff(days)],
+            )
+        )
+    if max_idle_days is not None:
+        queries.append((f"SELECT m.id FROM memory m WHERE {recency} < ?", [_cutoff(max_idle_days)]))
+    if max_rows_per_user is not None:
+        queries.append(
+            (
+                "SELECT id FROM (SELECT m.id, ROW_NUMBER() OVER ("
+                f"PARTITION BY m.user_id ORDER BY {recency} DESC, m.id DESC) AS rank "
+                "FROM memory m) WHERE rank > ?",
+                [max_rows_per_user],
+            )
+        )
+    with transaction() as conn:
+        doomed = set()
+        for sql, params in queries:
+            doomed.update(row[0] for row in conn.execute(sql, params))
+        if doomed:
+            rows = [(entry_id,) for entry_id in sorted(doomed)]
+            conn.executemany("DELETE FROM memory_tags WHERE memory_id = ?", rows)
+            conn.executemany("DELETE FROM memory WHERE id = ?", rows)
+            _bump_generation(conn)
+    if doomed:
+        _reset_indexes()
+    return len(doomed)
+
+
+def _reset_indexes() -> None:
+    """Rebuild the loaded indexes after rows were deleted.
 
-    def score(entry: Dict[str, Any]) -> float:
-        emb = entry["embedding"]
-        n = min(len(query_embedding), len(emb))
-        return sum(query_embedding[i] * emb[i] for i in range(n))
+    Each replacement, and its IVF index when ANN search is enabled and the
+    store is large enough, is built without holding the index lock, so
+    searches keep using the old index until the new one is swapped in and
+    never have to train one themselves.
+    """
+    global _models, _users
+    with _index_lock:
+        models = list(_indexes) or [None]
+        _models = None
+        _users = None
+    settings = _ann_settings()
+    use_ann = settings.get("enabled") and ann_index.available()
+    for model in models:
+        index = _build_index(model)
+        ann = None
+        if use_ann and len(index) >= settings.get("min_entries", 100000):
+            ann = ann_index.IVFIndex.build(
+                index.ids(),
+                index.rows(),
+                nlist=settings.get("nlist"),
+                nprobe=settings.get("nprobe", 8),
+            )
+        with _index_lock:
+            # Pick up rows inserted while the replacement was being built.
+            ids = index.ids()
+            _load_rows(index, after_id=ids[-1] if ids else 0, model=model)
+            _indexes[model] = index
+            _ann_unsaved[model] = 0
+            if ann is None:
+                _anns.pop(model, None)
+                _ann_path(model).unlink(missing_ok=True)
+            else:
+                _catch_up_ann(ann, model)
+                _anns[model] = ann
+                ann.save(_ann_path(model))
 
-    return sorted(entries, key=score, reverse=True)[:k]
 
+def optimize() -> None:
+    """Reclaim free pages and refresh planner statistics."""
+    with _get_pool().transaction() as conn:
+        conn.execute("VACUUM")
+        conn.execute("ANALYZE")
@@ -0,0 +1,124 @@
+"""Rule-based extraction of user facts from conversation turns.
+
+Each extractor takes the user's text from one turn and returns the facts it
+found as ``{"personal_data": {...}, "preferences": {...}}``, leaving out
+sections with nothing to report. Extra rules can be added with
+:func:`register`. Turns that mention a name or preference without matching
+any rule are reported by :func:`unresolved` so they can be handed to a
+slower extractor.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, Iterable, List
+
+Facts = Dict[str, Dict[str, str]]
+Extractor = Callable[[str], Facts]
+
+# A name is only taken when it is capitalised and closes its clause, so
+# "call me when the scan finishes" is left for the LLM to judge.
+_NAME = re.compile(
+    r"\b(?i:my name is|my name's|call me|i am called|i'm called)\s+"
+    r"([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)"
+    r"(?=\s*(?:[.,!?;:]|$)|\s+(?i:and|but|so)\b)"
+)
+_FAVOURITE = re.compile(
+    r"\bmy fav(?:ou?rite)?\s+([a-z ]{2,30}?)\s+is\s+([^.,!?\n]+)", re.IGNORECASE
+)
+_PREFERENCE = re.compile(
+    r"\bi (?:really )?(?:prefer|like|love|enjoy)\s+([^.,!?\n]+)", re.IGNORECASE
+)
+# Words suggesting a turn states facts for a section, whether or not a rule
+# could parse them.
+_CUES = {
+    "personal_data": re.compile(r"\b(?:name|call me|i am called|i'm called)\b", re.IGNORECASE),
+    "preferences": re.compile(r"\b(?:fav(?:ou?rite)?|prefer)", re.IGNORECASE),
+}
+# Words that can follow "call me" or "my name is" without being a name.
+_NOT_NAMES = {
+    "a", "about", "after", "again", "an", "and", "anytime", "at", "back", "before",
+    "but", "by", "if", "in", "later", "maybe", "no", "not", "now", "on", "once",
+    "please", "so", "sometime", "soon", "the", "then", "tomorrow", "tonight", "when",
+    "whenever", "yes", "you",
+}
+# Openings of a "prefer"/"like" object that state no actual preference.
+_NOT_PREFERENCES = {"it", "neither", "no", "none", "not", "nothing", "that", "them", "this"}
+
+
+def extract_name(text: str) -> Facts:
+    match = _NAME.search(text)
+    if not match or match.group(1).split()[0].lower() in _NOT_NAMES:
+        return {}
+    return {"personal_data": {"name": match.group(1)}}
+
+
+def extract_preferences(text: str) -> Facts:
+    preferences = {}
+    for topic, value in _FAVOURITE.findall(text):
+        preferences["favorite_" + "_".join(topic.lower().split())] = value.strip()
+    match = _PREFERENCE.search(text)
+    if match and match.group(1).split()[0].lower() not in _NOT_PREFERENCES:
+        preferences["likes"] = match.group(1).strip()
+    return {"preferences": preferences} if preferences else {}
+
+
+EXTRACTORS: List[Extractor] = [extract_name, extract_preferences]
+_stats = {"turns": 0, "turns_with_facts": 0, "rule_resolved": 0, "llm_calls": 0}
+_stats_lock = threading.Lock()
+
+
+def register(extractor: Extractor) -> Extractor:
+    """Add ``extractor`` to the rules run by :func:`extract`; usable as a decorator."""
+    EXTRACTORS.append(extractor)
+    return extractor
+
+
+def _apply(text: str) -> Facts:
+    facts: Facts = {}
+    for extractor in EXTRACTORS:
+        for section, values in extractor(text).items():
+            if values:
+                facts.setdefault(section, {}).update(values)
+    return facts
+
+
+def extract(entries: Iterable[Dict[str, str]]) -> Facts:
+    """Run every extractor over the user side of ``entries``.
+
+    Later turns win when two turns report the same fact.
+    """
+    facts: Facts = {"personal_data": {}, "preferences": {}}
+    turns = hits = 0
+    for entry in entries:
+        turns += 1
+        found = _apply(entry.get("user", "") or "")
+        for section, values in found.items():
+            facts.setdefault(section, {}).update(values)
+        hits += bool(found)
+    with _stats_lock:
+        _stats["turns"] += turns
+        _stats["turns_with_facts"] += hits
+    return facts
+
+
+def _is_unresolved(text: str) -> bool:
+    found = _apply(text)
+    return any(cue.search(text) and section not in found for section, cue in _CUES.items())
+
+
+def unresolved(entries: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Return the entries with a name or preference cue that no rule parsed."""
+    return [entry for entry in entries if _is_unresolved(entry.get("user", "") or "")]
+
+
+def record_outcome(used_llm: bool) -> None:
+    """Count whether a processing run needed the LLM."""
+    with _stats_lock:
+        _stats["llm_calls" if used_llm else "rule_resolved"] += 1
+
+
+def stats() -> Dict[str, float]:
+    """Return rule counters plus ``rule_hit_rate``, the share of runs the rules settled alone."""
+    with _stats_lock:
+        runs = _stats["rule_resolved"] + _stats["llm_calls"]
+        return {**_stats, "rule_hit_rate": _stats["rule_resolved"] / runs if runs else 0.0}
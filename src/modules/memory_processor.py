@@ -1,10 +1,12 @@
 import os
 import json
 import logging
+import threading
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from models.custom_memory import CustomMemory
 from modules.event_logger import load_events
+from modules import memory_extractors
 from config.config_loader import load_neocortex_config
 
 logger = logging.getLogger(__name__)
@@ -20,6 +22,9 @@ processing_bot = ChatOpenAI(model=model_name)
 
 # File to store processed memory
 PROCESSED_MEMORY_FILE = os.path.join(os.path.dirname(__file__), "../models/processed_memory.json")
+# Parsed contents of PROCESSED_MEMORY_FILE keyed by (path, mtime, size).
+_cache = {}
+_cache_lock = threading.Lock()
 
 
 def load_raw_memory():
@@ -33,24 +38,33 @@ def load_raw_memory():
         return {}
 
 
-def process_memory():
-    """
-    Process raw memory into structured data.
-    Extracts personal data from conversation and stores it as JSON.
+def _load_raw_memory_with_count():
+    """Load raw memory plus the store's running count of appended entries."""
+    try:
+        return memory.load_memory_with_count()
+    except Exception as e:
+        logger.error("Error loading memory: %s", e)
+        return {}, 0
+
+
+def _new_entries(conversation_history, appended, watermark):
+    """Return the entries added after ``watermark``, or everything if it is lost.
+
+    The stored history is a sliding window over ``appended`` entries in
+    total, so the watermark records that running count rather than a
+    position or the entries' contents.
     """
-    raw_memory = load_raw_memory()
-    if not raw_memory:
-        logger.info("No memory found to process.")
-        raw_memory = {"conversation_history": [], "preferences": {}}
+    done = (watermark or {}).get("appended")
+    if done is None or done > appended:
+        return conversation_history
+    fresh = min(appended - done, len(conversation_history))
+    return conversation_history[len(conversation_history) - fresh:]
 
-    # Wrap list memory into a dictionary if needed.
-    if isinstance(raw_memory, list):
-        raw_memory = {"conversation_history": raw_memory}
 
-    # Build conversation text for the prompt.
-    conversation_history = raw_memory.get("conversation_history", [])
+def _llm_personal_data(entries):
+    """Ask the language model for personal data mentioned in ``entries``."""
     conversation_text = "\n".join(
-        [f"User: {entry.get('user', '')}\nBot: {entry.get('bot', '')}" for entry in conversation_history]
+        [f"User: {entry.get('user', '')}\nBot: {entry.get('bot', '')}" for entry in entries]
     )
 
     prompt = f"""
@@ -69,30 +83,106 @@ Conversation:
     except json.JSONDecodeError:
         extracted_data = {}
 
+    return {k: v for k, v in (extracted_data.get("personal_data") or {}).items() if v}
+
+
+def process_memory():
+    """
+    Process raw memory into structured data.
+    Extracts personal data from conversation and stores it as JSON.
+
+    Only turns added since the last run are examined and the facts found are
+    merged into the stored ones; the file is only rewritten when something
+    changed. Rule-based extractors run first and the model is only shown the
+    new turns that mention a name or preference the rules could not parse.
+    """
+    raw_memory, appended = _load_raw_memory_with_count()
+    if not raw_memory:
+        logger.info("No memory found to process.")
+        raw_memory = {"conversation_history": [], "preferences": {}}
+
+    # Wrap list memory into a dictionary if needed.
+    if isinstance(raw_memory, list):
+        raw_memory = {"conversation_history": raw_memory}
+
+    conversation_history = raw_memory.get("conversation_history", [])
+    previous = retrieve_processed_memory() if os.path.exists(PROCESSED_MEMORY_FILE) else {}
+    new_entries = _new_entries(conversation_history, appended, previous.get("watermark"))
+
+    # Cheap local rules first; the LLM only sees turns with a cue they missed.
+    facts = memory_extractors.extract(new_entries)
+    personal_data = dict(previous.get("personal_data", {}))
+    personal_data.update(facts.get("personal_data", {}))
+    if new_entries:
+        unparsed = memory_extractors.unresolved(new_entries)
+        memory_extractors.record_outcome(bool(unparsed))
+        if unparsed:
+            personal_data.update(_llm_personal_data(unparsed))
+
     structured_data = {
-        "personal_data": extracted_data.get("personal_data", {}),
-        "preferences": raw_memory.get("preferences", {}),
+        "personal_data": personal_data,
+        "preferences": {
+            **previous.get("preferences", {}),
+            **raw_memory.get("preferences", {}),
+            **facts.get("preferences", {}),
+        },
         "conversation_history": conversation_history,
         "events": load_events()[-50:],
+        "watermark": {"appended": appended},
     }
+    if structured_data == previous:
+        logger.info("No new conversation to process.")
+        return
 
     # Save the processed memory.
     with open(PROCESSED_MEMORY_FILE, "w") as f:
         json.dump(structured_data, f, indent=4)
+    _remember(structured_data)
 
     logger.info("Memory successfully processed and stored.")
 
 
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_mtime_ns, st.st_size
+
+
+def _remember(data):
+    """Cache ``data`` as the current contents of the processed memory file."""
+    with _cache_lock:
+        _cache["key"] = _stat_key(PROCESSED_MEMORY_FILE)
+        _cache["data"] = data
+
+
 def retrieve_processed_memory():
     """
     Retrieve and return the structured memory data.
+
+    The parsed file is cached and only re-read when its mtime or size
+    changes, so repeated calls per turn cost a ``stat``. The returned dict is
+    shared; treat it as read-only.
     """
-    try:
-        with open(PROCESSED_MEMORY_FILE, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
+    key = _stat_key(PROCESSED_MEMORY_FILE)
+    with _cache_lock:
+        if "data" in _cache and _cache["key"] == key:
+            return _cache["data"]
+    if key is None:
         logger.warning("No processed memory found.")
-        return {}
+        data = {}
+    else:
+        try:
+            with open(PROCESSED_MEMORY_FILE, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.warning("No processed memory found.")
+            data = {}
+    with _cache_lock:
+        _cache["key"] = key
+        _cache["data"] = data
+    return data
 
 
 def chat_loop():
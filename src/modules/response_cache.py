@@ -0,0 +1,185 @@
+"""Opt-in cache of chat replies for repeated questions.
+
+A reply is reused when a later question normalises to the same text, or
+when its embedding is at least ``similarity_threshold`` similar to a cached
+question's and both name the same IPs, hostnames, CVE ids and numbers.
+Vectors from the hashing fallback embedder are too coarse to tell such
+questions apart, so with it only exact matches are served. Entries expire
+after ``ttl_seconds`` and the least recently used one is evicted beyond
+``max_entries``. The whole cache is dropped whenever :mod:`modules.context`
+records a new command or scan result, since cached replies may describe the
+old output.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from config.config_loader import load_neocortex_config
+from modules import context
+from modules import embedding_utils
+
+_WS = re.compile(r"\s+")
+# IPv4 addresses and networks, CVE ids, dotted host names and bare numbers.
+_ENTITY = re.compile(
+    r"\b(?:\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?"
+    r"|cve-\d{4}-\d+"
+    r"|(?:[a-z0-9-]+\.)+[a-z][a-z0-9-]*"
+    r"|\d+(?:\.\d+)?)\b"
+)
+
+
+def normalize(text: str) -> str:
+    """Lower-case ``text``, collapse whitespace and drop trailing punctuation."""
+    return _WS.sub(" ", text.lower()).strip().rstrip("?!. ")
+
+
+def entities(text: str) -> tuple:
+    """Return the sorted IPs, CVE ids, host names and numbers in normalised ``text``."""
+    return tuple(sorted(_ENTITY.findall(text)))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """LRU map from normalised question to reply, with a similarity fallback."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 300.0,
+        similarity_threshold: float = 0.92,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # key -> (stored_at, model_id, vector, entities, response)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generation = context.generation
+        self._lock = threading.Lock()
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _check_generation(self) -> None:
+        # Caller holds ``self._lock``.
+        if context.generation != self._generation:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._generation = context.generation
+
+    def _expire(self, now: float) -> None:
+        # Caller holds ``self._lock``.
+        stale = [k for k, e in self._entries.items() if now - e[0] > self.ttl_seconds]
+        for key in stale:
+            del self._entries[key]
+
+    def get(self, question: str) -> Dict[str, Any] | None:
+        """Return a cached reply for ``question`` or ``None``."""
+        key = normalize(question)
+        with self._lock:
+            self._check_generation()
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return dict(entry[4])
+            if not self._entries:
+                self._stats["misses"] += 1
+                return None
+        model = embedding_utils.model_id()
+        if model == embedding_utils.FALLBACK_MODEL_ID:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        vector = embedding_utils.embed_text(key)
+        wanted = entities(key)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for cached_key, (_, cached_model, cached_vec, cached_entities, _) in self._entries.items():
+                if cached_model != model or cached_entities != wanted:
+                    continue
+                score = _cosine(vector, cached_vec)
+                if score >= best_score:
+                    best_key, best_score = cached_key, score
+            if best_key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            return dict(self._entries[best_key][4])
+
+    def put(self, question: str, response: Dict[str, Any]) -> None:
+        """Cache ``response`` as the reply to ``question``."""
+        key = normalize(question)
+        generation = context.generation
+        model = embedding_utils.model_id()
+        # Fallback vectors are never compared, so skip computing them.
+        vector = None if model == embedding_utils.FALLBACK_MODEL_ID else embedding_utils.embed_text(key)
+        with self._lock:
+            self._check_generation()
+            if generation != self._generation:
+                return  # context changed while embedding; reply may be stale
+            self._entries[key] = (time.monotonic(), model, vector, entities(key), dict(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters, current size and ``hit_rate`` over all lookups."""
+        with self._lock:
+            hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def _settings() -> Dict[str, Any]:
+    return load_neocortex_config().get("response_cache", {})
+
+
+def enabled() -> bool:
+    return bool(_settings().get("enabled", False))
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = _settings()
+            _cache = ResponseCache(
+                max_entries=settings.get("max_entries", 256),
+                ttl_seconds=settings.get("ttl_seconds", 300.0),
+                similarity_threshold=settings.get("similarity_threshold", 0.92),
+            )
+        return _cache
+
+
+def stats() -> Dict[str, float]:
+    """Return the shared cache's counters and hit rate."""
+    return get_cache().stats()
@@ -0,0 +1,91 @@
+"""Apply the ``retention`` rules from ``neocortex.json`` and compact storage."""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from config.config_loader import load_neocortex_config
+from . import chat_db, memory_db
+
+SESSIONS_DIR = Path(__file__).resolve().parent.parent.parent / "sessions"
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def _settings() -> Dict[str, Any]:
+    return load_neocortex_config().get("retention", {})
+
+
+def prune_sessions(max_age_days: float) -> int:
+    """Delete GUI session files not written to for ``max_age_days``."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for path in SESSIONS_DIR.glob("session_*.jsonl"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def run_compaction() -> Dict[str, int]:
+    """Evict expired rows, then ``VACUUM``/``ANALYZE`` the databases.
+
+    Returns how many memories, chat rows and session files were removed.
+    """
+    settings = _settings()
+    removed = {
+        "memories": memory_db.apply_retention(
+            max_rows_per_user=settings.get("max_rows_per_user"),
+            tag_ttl_days=settings.get("tag_ttl_days"),
+            max_idle_days=settings.get("max_idle_days"),
+        ),
+        "chat_rows": 0,
+        "sessions": 0,
+    }
+    if settings.get("chat_max_age_days") is not None:
+        removed["chat_rows"] = chat_db.prune(settings["chat_max_age_days"])
+    if settings.get("session_max_age_days") is not None:
+        removed["sessions"] = prune_sessions(settings["session_max_age_days"])
+    if removed["memories"]:
+        memory_db.optimize()
+    if removed["chat_rows"]:
+        chat_db.optimize()
+    return removed
+
+
+def _loop(interval: float) -> None:
+    while not _stop.wait(interval):
+        try:
+            removed = run_compaction()
+            logging.info("Retention compaction removed %s", removed)
+        except Exception:
+            logging.exception("Retention compaction failed")
+
+
+def start_background_compaction() -> threading.Thread | None:
+    """Run :func:`run_compaction` periodically on a daemon thread.
+
+    Does nothing when retention is disabled. Calling it again while the
+    thread is alive returns the running thread.
+    """
+    global _thread
+    settings = _settings()
+    if not settings.get("enabled", False):
+        return None
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    _stop.clear()
+    interval = float(settings.get("compaction_interval_seconds", 3600))
+    _thread = threading.Thread(target=_loop, args=(interval,), daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop_background_compaction() -> None:
+    _stop.set()
@@ -1,25 +1,145 @@
+import atexit
+import glob
+import json
+import os
+import re
+import threading
+import time
 from typing import List, Dict
 
 from models.custom_memory import CustomMemory
 
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except Exception:  # pragma: no cover
+    fcntl = None
+
 class ShortTermMemoryCache:
-    """Ephemeral in-process cache for recent messages."""
+    """Ephemeral in-process cache for recent messages.
+
+    Buffered messages are written to the store in one batch once ``limit``
+    messages, ``max_bytes`` of text or ``max_age`` seconds have built up; a
+    background thread enforces the age bound. Each message is also appended
+    to a small journal that is replayed into the store on start-up, so a
+    crash loses nothing that was buffered.
+
+    Every process journals to ``<journal_path>.<pid>`` and holds a lock on
+    ``<journal_path>.<pid>.lock`` while it runs. Start-up only replays
+    journals whose lock is free, i.e. whose process has exited; without
+    ``fcntl`` only a stale journal left under this process's own pid is.
+    """
 
-    def __init__(self, limit: int = 5, store: CustomMemory | None = None) -> None:
+    def __init__(
+        self,
+        limit: int = 5,
+        store: CustomMemory | None = None,
+        max_age: float = 5.0,
+        max_bytes: int = 64 * 1024,
+        journal_path: str | None = None,
+    ) -> None:
         self.limit = limit
+        self.max_age = max_age
+        self.max_bytes = max_bytes
         self.store = store or CustomMemory()
+        self.journal_base = journal_path or self.store.memory_file + ".journal"
+        self.journal_path = f"{self.journal_base}.{os.getpid()}"
         self._buffer: List[Dict[str, str]] = []
+        self._bytes = 0
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flusher: threading.Thread | None = None
+        self._replay_journals()
+        self._owner = self._claim(self.journal_path)
+
+    @staticmethod
+    def _claim(journal: str):
+        """Lock ``journal``'s owner file; return the open handle, or ``None`` if held."""
+        handle = open(journal + ".lock", "a+b")
+        if fcntl is None:
+            return handle
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def _replay_journals(self) -> None:
+        """Replay journals left by processes that have exited, then delete them."""
+        pattern = re.compile(re.escape(os.path.basename(self.journal_base)) + r"(\.\d+)?(\.lock)?$")
+        journals = {
+            path[: -len(".lock")] if path.endswith(".lock") else path
+            for path in glob.glob(glob.escape(self.journal_base) + "*")
+            if pattern.match(os.path.basename(path))
+        }
+        for journal in sorted(journals):
+            if fcntl is None and journal != self.journal_path:
+                continue  # cannot tell whether its process is still running
+            owner = self._claim(journal)
+            if owner is None:
+                continue
+            try:
+                if os.path.exists(journal):
+                    self._replay(journal)
+                    os.remove(journal)
+                if journal != self.journal_path and os.path.exists(journal + ".lock"):
+                    os.remove(journal + ".lock")
+            finally:
+                owner.close()
+
+    def _replay(self, journal: str) -> None:
+        entries = []
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # torn final write
+        self.store.save_contexts(entries)
+
+    def _start_flusher(self) -> None:
+        # Caller holds ``self._lock``.
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, daemon=True)
+            self._flusher.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._buffer:
+                    self._wake.wait()
+                due = self._oldest + self.max_age - time.monotonic()
+                if due > 0:
+                    self._wake.wait(due)
+                    continue
+            self.flush()
 
     def add_message(self, user: str, bot: str) -> None:
-        self._buffer.append({"user": user, "bot": bot})
-        if len(self._buffer) >= self.limit:
+        entry = {"user": user, "bot": bot}
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(entry)
+            self._bytes += len(line)
+            full = len(self._buffer) >= self.limit or self._bytes >= self.max_bytes
+            self._start_flusher()
+            self._wake.notify()
+        if full:
             self.flush()
 
     def flush(self) -> None:
-        if not self._buffer:
-            return
-        for entry in self._buffer:
-            self.store.save_context(entry["user"], entry["bot"])
-        self._buffer.clear()
+        with self._lock:
+            if not self._buffer:
+                return
+            self.store.save_contexts(self._buffer)
+            self._buffer = []
+            self._bytes = 0
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
 
 cache = ShortTermMemoryCache()
+atexit.register(cache.flush)
@@ -0,0 +1,56 @@
+"""Helpers for displaying LLM replies while they are still being generated."""
+
+THINK_MARKER = "[[THINK]]"
+
+
+class ThinkSplitter:
+    """Split a streamed reply into chat text and ``[[THINK]]`` logic text.
+
+    Text before the marker is chat and everything after it is logic. A chunk
+    tail that could be the start of a marker split across chunks is held
+    back until the next chunk shows whether it is one.
+    """
+
+    def __init__(self, marker: str = THINK_MARKER) -> None:
+        self.marker = marker
+        self.in_logic = False
+        self._held = ""
+        self._chat: list[str] = []
+        self._logic: list[str] = []
+
+    def feed(self, chunk: str) -> tuple[str, str]:
+        """Return the ``(chat, logic)`` text that ``chunk`` makes final."""
+        if self.in_logic:
+            self._logic.append(chunk)
+            return "", chunk
+        text = self._held + chunk
+        idx = text.find(self.marker)
+        if idx >= 0:
+            self.in_logic = True
+            self._held = ""
+            chat, logic = text[:idx], text[idx + len(self.marker):]
+        else:
+            keep = 0
+            for n in range(min(len(self.marker) - 1, len(text)), 0, -1):
+                if self.marker.startswith(text[-n:]):
+                    keep = n
+                    break
+            chat, logic = text[: len(text) - keep], ""
+            self._held = text[len(text) - keep:]
+        self._chat.append(chat)
+        self._logic.append(logic)
+        return chat, logic
+
+    def finish(self) -> tuple[str, str]:
+        """Release any held-back text once the stream has ended."""
+        held, self._held = self._held, ""
+        self._chat.append(held)
+        return held, ""
+
+    @property
+    def chat_text(self) -> str:
+        return "".join(self._chat).strip()
+
+    @property
+    def logic_text(self) -> str:
+        return "".join(self._logic).strip()
@@ -1,26 +1,201 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Iterable, List
+from typing import Any, Iterable, Iterator, List, Sequence
 
 from . import chat_db, memory_db
-from .embedding_utils import embed_text
+from .embedding_utils import embed_text, embed_texts, model_id
+
+MODEL_NAME = "facebook/bart-large-cnn"
+# Texts of at most this many words are stored verbatim instead of summarized.
+SHORT_TEXT_WORDS = 40
+CACHE_SIZE = 1024
+# Long inputs are split into chunks of this many words (well inside BART's
+# 1024-token window), each repeating the tail of the previous one.
+CHUNK_WORDS = 400
+CHUNK_OVERLAP = 40
+
+_pipeline: Any = None
+_pipeline_loaded = False
+_pipeline_lock = threading.Lock()
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_pipeline() -> Any:
+    """Return the shared summarization pipeline, loading it on first use.
+
+    ``None`` means transformers is unavailable; the failure is remembered so
+    later calls fall back immediately.
+    """
+    global _pipeline, _pipeline_loaded
+    if not _pipeline_loaded:
+        with _pipeline_lock:
+            if not _pipeline_loaded:
+                try:
+                    from transformers import pipeline
+
+                    _pipeline = pipeline("summarization", model=MODEL_NAME)
+                except Exception:
+                    logging.info("transformers unavailable; summaries fall back to truncation")
+                    _pipeline = None
+                _pipeline_loaded = True
+    return _pipeline
+
+
+def _cache_key(text: str, max_length: int, min_length: int) -> str:
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{max_length}:{min_length}:{digest}"
+
+
+def _run_model(
+    texts: List[str], max_length: int, min_length: int, batch_size: int
+) -> List[str] | None:
+    """Summarize ``texts`` in one batched pipeline call, or ``None`` on failure."""
+    model = get_pipeline()
+    if model is None:
+        return None
+    try:
+        with _pipeline_lock:
+            output = model(
+                texts,
+                max_length=max_length,
+                min_length=min_length,
+                do_sample=False,
+                batch_size=batch_size,
+            )
+        return [item["summary_text"] for item in output]
+    except Exception:
+        logging.exception("Summarization failed; falling back to truncation")
+        return None
+
+
+def summarize_texts(
+    texts: Sequence[str],
+    max_length: int = 100,
+    min_length: int = 30,
+    batch_size: int = 8,
+) -> List[str]:
+    """Summarize every text in ``texts``, running the model in batches.
+
+    Short texts are returned unchanged and previously seen texts come from a
+    content-hash cache, so only new long texts reach the model. Texts longer
+    than one chunk go through :func:`summarize_long`.
+    """
+    texts = list(texts)
+    results: List[str | None] = [None] * len(texts)
+    todo: dict[str, List[int]] = {}
+    with _cache_lock:
+        for pos, text in enumerate(texts):
+            if len(text.split()) <= SHORT_TEXT_WORDS:
+                results[pos] = text
+                continue
+            key = _cache_key(text, max_length, min_length)
+            if key in _cache:
+                _cache.move_to_end(key)
+                results[pos] = _cache[key]
+            else:
+                todo.setdefault(key, []).append(pos)
+    if not todo:
+        return results
+    summaries: dict[str, str] = {}
+    batch = []
+    for key, positions in todo.items():
+        text = texts[positions[0]]
+        if len(text.split()) > CHUNK_WORDS:
+            summaries[key] = summarize_long([text], max_length, min_length, batch_size=batch_size)
+        else:
+            batch.append(key)
+    if batch:
+        output = _run_model([texts[todo[key][0]] for key in batch], max_length, min_length, batch_size)
+        if output is None:
+            output = [texts[todo[key][0]][:max_length] for key in batch]
+        summaries.update(zip(batch, output))
+    if get_pipeline() is not None:
+        with _cache_lock:
+            _cache.update(summaries)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    for key, summary in summaries.items():
+        for pos in todo[key]:
+            results[pos] = summary
+    return results
 
 
 def summarize_text(text: str, max_length: int = 100, min_length: int = 30) -> str:
     """Summarize ``text`` using transformers if available, else a simple truncation."""
-    try:
-        from transformers import pipeline
+    return summarize_texts([text], max_length=max_length, min_length=min_length)[0]
 
-        summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        result = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
-        return result[0]["summary_text"]
-    except Exception:
-        return text[:max_length]
+
+def chunk_words(
+    pieces: Iterable[str], size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP
+) -> Iterator[str]:
+    """Yield chunks of ``size`` words, each repeating the previous ``overlap``.
+
+    ``pieces`` is consumed lazily, so only one chunk is held at a time.
+    """
+    window: List[str] = []
+    fresh = 0
+    for piece in pieces:
+        for word in piece.split():
+            window.append(word)
+            fresh += 1
+            if len(window) >= size:
+                yield " ".join(window)
+                window = window[size - overlap :] if overlap else []
+                fresh = 0
+    if fresh:
+        yield " ".join(window)
+
+
+def summarize_long(
+    pieces: Iterable[str],
+    max_length: int = 100,
+    min_length: int = 30,
+    chunk_size: int = CHUNK_WORDS,
+    overlap: int = CHUNK_OVERLAP,
+    batch_size: int = 8,
+) -> str:
+    """Map-reduce summary of arbitrarily long text streamed from ``pieces``.
+
+    Overlapping chunks are summarized ``batch_size`` at a time. Whenever the
+    partial summaries on one level add up to a chunk they are summarized into
+    the next level, so memory stays bounded by a few chunks per level.
+    """
+    levels: List[List[str]] = []
+
+    def push(level: int, summaries: List[str]) -> None:
+        if len(levels) <= level:
+            levels.append([])
+        levels[level].extend(summaries)
+        if sum(len(s.split()) for s in levels[level]) >= chunk_size:
+            merged = list(chunk_words(levels[level], chunk_size, overlap))
+            levels[level] = []
+            push(level + 1, summarize_texts(merged, max_length, min_length, batch_size))
+
+    batch: List[str] = []
+    for chunk in chunk_words(pieces, chunk_size, overlap):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            push(0, summarize_texts(batch, max_length, min_length, batch_size))
+            batch = []
+    if batch:
+        push(0, summarize_texts(batch, max_length, min_length, batch_size))
+    # Earlier input was promoted to higher levels, so read them top-down.
+    remaining = [s for level in reversed(levels) for s in level]
+    while len(remaining) > 1:
+        chunks = list(chunk_words(remaining, chunk_size, overlap))
+        if len(chunks) == 1:
+            return summarize_texts(chunks, max_length, min_length)[0]
+        remaining = summarize_texts(chunks, max_length, min_length, batch_size)
+    return remaining[0] if remaining else ""
 
 
 def summarize_messages(chat_id: int, messages: Iterable[tuple[str, str]]) -> None:
     """Summarize messages for a chat and store the result."""
-    text = " ".join(m[1] for m in messages)
-    summary = summarize_text(text)
+    summary = summarize_long(m[1] for m in messages)
     chat_db.record_summary(chat_id, summary)
 
 
@@ -29,12 +204,42 @@ def summarize_and_store(user_id: str, raw_input: str, tags: List[str] | None = N
     summary = summarize_text(raw_input)
     embedding = embed_text(summary)
     timestamp = datetime.utcnow().isoformat() + "Z"
-    memory_db.add_entry(user_id, timestamp, raw_input, summary, embedding, tags or [])
+    memory_db.add_entry(user_id, timestamp, raw_input, summary, embedding, tags or [], model_id())
+
+
+def summarize_and_store_many(
+    user_id: str, texts: Iterable[str], tags: List[str] | None = None
+) -> None:
+    """Summarize and embed ``texts``, then store them in one transaction."""
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    texts = list(texts)
+    summaries = summarize_texts(texts)
+    embeddings = embed_texts(summaries)
+    model = model_id()
+    memory_db.add_entries(
+        (user_id, timestamp, text, summary, embedding, tags or [], model)
+        for text, summary, embedding in zip(texts, summaries, embeddings)
+    )
+
 
+def retrieve_relevant(
+    query: str,
+    k: int = 5,
+    user_id: str | None = None,
+    tags: List[str] | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> List[str]:
+    """Retrieve summaries most relevant to ``query``.
 
-def retrieve_relevant(query: str, k: int = 5) -> List[str]:
-    """Retrieve summaries most relevant to ``query``."""
+    Keyword (BM25) and vector rankings are fused so exact terms such as IPs
+    or CVE ids are found even when the embedding misses them. The optional
+    filters restrict the search to one user, entries carrying any of
+    ``tags`` and an ISO timestamp window.
+    """
     vec = embed_text(query)
-    results = memory_db.search(vec, k)
+    results = memory_db.hybrid_search(
+        query, vec, k, user_id=user_id, tags=tags, since=since, until=until, model=model_id()
+    )
     return [r["summary"] for r in results]
 
@@ -0,0 +1,474 @@
+"""In-memory matrix of normalised embeddings for fast similarity search."""
+
+import heapq
+import json
+import math
+import os
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except Exception:  # pragma: no cover
+    fcntl = None
+
+HAS_NUMPY = np is not None
+
+
+_BLOCK_ROWS = 8192
+
+
+def _normalise(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        return [float(v) for v in vector]
+    return [v / norm for v in vector]
+
+
+def quantize(vector: Sequence[float]) -> Tuple[bytes, float]:
+    """Return the normalised ``vector`` as int8 bytes plus its scale factor.
+
+    ``int8 * scale`` reconstructs the unit vector; using one scale per vector
+    keeps the rounding error proportional to that vector's largest component.
+    """
+    if np is not None:
+        data, scales = quantize_many(np.asarray(vector, dtype=np.float64)[None, :])
+        return data[0].tobytes(), float(scales[0])
+    unit = _normalise(vector)
+    peak = max((abs(v) for v in unit), default=0.0)
+    scale = peak / 127 if peak else 1.0
+    return array("b", (round(v / scale) for v in unit)).tobytes(), scale
+
+
+def quantize_many(matrix):
+    """Quantize each row of a 2-D array as :func:`quantize` does (NumPy only).
+
+    Returns the int8 matrix and one float scale per row.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    unit = matrix / np.where(norms, norms, 1.0)
+    peaks = np.abs(unit).max(axis=1) if unit.shape[1] else np.zeros(len(unit))
+    scales = np.where(peaks, peaks / 127, 1.0)
+    return np.rint(unit / scales[:, None]).astype(np.int8), scales
+
+
+class VectorIndex:
+    """Exact cosine-similarity index over ``(id, embedding)`` pairs.
+
+    Vectors are L2-normalised on insert so a query is scored against every
+    entry with a single matrix-vector product. Rows of different lengths are
+    zero padded, which keeps the old "dot product over the shared prefix"
+    behaviour for mixed embedders. When NumPy is missing a plain list of
+    tuples is scanned instead.
+    """
+
+    def __init__(self) -> None:
+        self.dim = 0
+        self._size = 0
+        if np is not None:
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+        else:
+            self._ids = []
+            self._rows: List[Tuple[float, ...]] = []
+            self._lookup: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def ids(self) -> List[int]:
+        if np is not None:
+            return self._ids[: self._size].tolist()
+        return list(self._ids)
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        capacity, width = self._matrix.shape
+        if rows <= capacity and dim <= width:
+            return
+        new_capacity = max(rows, capacity * 2, 64)
+        new_width = max(dim, width)
+        matrix = np.zeros((new_capacity, new_width), dtype=np.float32)
+        matrix[: self._size, :width] = self._matrix[: self._size]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def add(self, entry_id: int, vector: Sequence[float]) -> None:
+        self.add_many([(entry_id, vector)])
+
+    def add_many(self, items: Iterable[Tuple[int, Sequence[float]]]) -> None:
+        """Append entries; ids are expected in ascending order."""
+        items = list(items)
+        if not items:
+            return
+        self.dim = max(self.dim, max(len(v) for _i, v in items))
+        if np is None:
+            for entry_id, vector in items:
+                self._lookup[entry_id] = len(self._ids)
+                self._ids.append(entry_id)
+                self._rows.append(tuple(_normalise(vector)))
+            self._size += len(items)
+            return
+
+        self._reserve(self._size + len(items), self.dim)
+        for offset, (entry_id, vector) in enumerate(items):
+            row = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(row))
+            if norm:
+                row = row / norm
+            self._matrix[self._size + offset, : len(row)] = row
+            self._ids[self._size + offset] = entry_id
+        self._size += len(items)
+
+    def query_vector(self, query: Sequence[float]):
+        """Return ``query`` normalised and padded to the index width."""
+        if np is None:
+            return _normalise(query)
+        width = max(self._matrix.shape[1], self.dim)
+        q = np.zeros(width, dtype=np.float32)
+        raw = np.asarray(query, dtype=np.float32)[:width]
+        q[: len(raw)] = raw
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q /= norm
+        return q
+
+    def positions(self, ids: Iterable[int]):
+        """Map entry ids to row positions, dropping ids that are not indexed."""
+        if np is None:
+            return [self._lookup[i] for i in ids if i in self._lookup]
+        ids = np.fromiter(ids, dtype=np.int64)
+        if not self._size or not len(ids):
+            return np.zeros(0, dtype=np.int64)
+        known = self._ids[: self._size]
+        pos = np.minimum(np.searchsorted(known, ids), self._size - 1)
+        return pos[known[pos] == ids]
+
+    def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        ids: Iterable[int] | None = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(id, score)`` pairs ordered by cosine similarity.
+
+        ``ids`` restricts scoring to a candidate subset of the index.
+        """
+        if not self._size or k <= 0:
+            return []
+        q = self.query_vector(query)
+        if np is None:
+            if ids is None:
+                rows = zip(self._ids, self._rows)
+            else:
+                rows = ((self._ids[p], self._rows[p]) for p in self.positions(ids))
+            scored = (
+                (sum(a * b for a, b in zip(q, row)), entry_id) for entry_id, row in rows
+            )
+            return [(i, s) for s, i in heapq.nlargest(k, scored, key=lambda t: t[0])]
+
+        if ids is None:
+            matrix = self._matrix[: self._size]
+            row_ids = self._ids[: self._size]
+        else:
+            pos = self.positions(ids)
+            matrix = self._matrix[pos]
+            row_ids = self._ids[pos]
+        count = len(row_ids)
+        if not count:
+            return []
+        scores = matrix @ q
+        k = min(k, count)
+        if k < count:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row_ids[i]), float(scores[i])) for i in top]
+
+    def rows(self, positions=None):
+        """Return normalised rows as float32 (NumPy only), all by default."""
+        matrix = self._matrix[: self._size]
+        return matrix if positions is None else matrix[positions]
+
+
+class QuantizedIndex(VectorIndex):
+    """Cosine index holding int8 vectors with one float scale per row.
+
+    The int8 matrix needs a quarter of the memory of float32. A query first
+    ranks every row on the quantized matrix, then re-scores the best
+    ``k * oversample`` candidates at full precision with vectors supplied by
+    ``fetch``, which maps a list of ids to their original embeddings.
+    Requires NumPy.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[int]], Dict[int, Sequence[float]]],
+        oversample: int = 4,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("NumPy is required for the quantized index")
+        super().__init__()
+        self.fetch = fetch
+        self.oversample = oversample
+        self._matrix = np.zeros((0, 0), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        capacity, width = self._matrix.shape
+        if rows <= capacity and dim <= width:
+            return
+        new_capacity = max(rows, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, max(dim, width)), dtype=np.int8)
+        matrix[: self._size, :width] = self._matrix[: self._size]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        scales = np.ones(new_capacity, dtype=np.float32)
+        scales[: self._size] = self._scales[: self._size]
+        self._matrix, self._ids, self._scales = matrix, ids, scales
+
+    def add_many(self, items: Iterable[Tuple[int, Sequence[float]]]) -> None:
+        items = list(items)
+        if not items or len({len(v) for _i, v in items}) > 1:
+            self.add_quantized((entry_id, *quantize(vector)) for entry_id, vector in items)
+            return
+        data, scales = quantize_many([vector for _i, vector in items])
+        self.dim = max(self.dim, data.shape[1])
+        self._reserve(self._size + len(items), self.dim)
+        end = self._size + len(items)
+        self._matrix[self._size : end, : data.shape[1]] = data
+        self._ids[self._size : end] = [entry_id for entry_id, _v in items]
+        self._scales[self._size : end] = scales
+        self._size = end
+
+    def add_quantized(self, items: Iterable[Tuple[int, bytes, float]]) -> None:
+        """Append pre-quantized ``(id, int8 bytes, scale)`` rows."""
+        items = list(items)
+        if not items:
+            return
+        self.dim = max(self.dim, max(len(q) for _i, q, _s in items))
+        self._reserve(self._size + len(items), self.dim)
+        for offset, (entry_id, data, scale) in enumerate(items):
+            row = np.frombuffer(data, dtype=np.int8)
+            self._matrix[self._size + offset, : len(row)] = row
+            self._ids[self._size + offset] = entry_id
+            self._scales[self._size + offset] = scale
+        self._size += len(items)
+
+    def rows(self, positions=None):
+        if positions is None:
+            positions = slice(0, self._size)
+        matrix = self._matrix[: self._size][positions].astype(np.float32)
+        return matrix * self._scales[: self._size][positions][:, None]
+
+    def nbytes(self) -> int:
+        """Bytes held by the quantized rows and their scales."""
+        return self._size * (self._matrix.shape[1] + self._scales.itemsize)
+
+    def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        ids: Iterable[int] | None = None,
+    ) -> List[Tuple[int, float]]:
+        if not self._size or k <= 0:
+            return []
+        q = self.query_vector(query)
+        pos = np.arange(self._size) if ids is None else self.positions(ids)
+        if not len(pos):
+            return []
+        scores = np.empty(len(pos), dtype=np.float32)
+        for start in range(0, len(pos), _BLOCK_ROWS):
+            if ids is None:
+                block = slice(start, min(start + _BLOCK_ROWS, self._size))
+            else:
+                block = pos[start : start + _BLOCK_ROWS]
+            # Upcast one block at a time so scoring never materialises a
+            # float copy of the whole matrix.
+            chunk = self._matrix[block].astype(np.float32) @ q
+            scores[start : start + len(chunk)] = chunk * self._scales[block]
+        depth = min(k * self.oversample, len(pos))
+        if depth < len(pos):
+            top = np.argpartition(-scores, depth - 1)[:depth]
+        else:
+            top = np.arange(len(pos))
+        candidates = [int(i) for i in self._ids[pos[top]]]
+        full = self.fetch(candidates)
+        exact = VectorIndex()
+        exact.add_many((i, full[i]) for i in sorted(candidates) if i in full)
+        return exact.search(query, k)
+
+
+class MappedIndex(VectorIndex):
+    """Float32 index persisted in sidecar files and opened with ``numpy.memmap``.
+
+    ``<db>.vectors.f32`` holds the normalised rows and ``<db>.vectors.ids``
+    the matching ids; rows are only ever appended. ``<db>.vectors.json``
+    records the row width and the database generation the files were built
+    for. Opening an index maps the files without reading them, so startup
+    cost does not grow with the store and pages load on first use.
+
+    Files are never rewritten in place: a reset or a wider row writes new
+    files and renames them over the old ones, so a mapping that is still
+    being searched keeps reading the old data. Writers in every process
+    serialise on ``<db>.vectors.lock`` and re-map the files before
+    appending, which picks up rows other processes added. Requires NumPy.
+    """
+
+    def __init__(self, db_path: str | Path, generation: int, name: str = "vectors") -> None:
+        if np is None:
+            raise RuntimeError("NumPy is required for the memory-mapped index")
+        super().__init__()
+        db_path = Path(db_path)
+        self.generation = generation
+        self._vec_path = db_path.with_suffix(f".{name}.f32")
+        self._ids_path = db_path.with_suffix(f".{name}.ids")
+        self._header_path = db_path.with_suffix(f".{name}.json")
+        self._lock_path = db_path.with_suffix(f".{name}.lock")
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @property
+    def last_id(self) -> int:
+        return int(self._ids[self._size - 1]) if self._size else 0
+
+    @contextmanager
+    def locked(self):
+        """Hold the cross-process lock that serialises writes to the files."""
+        if not self._lock_depth and fcntl is not None:
+            self._lock_file = open(self._lock_path, "a+b")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if not self._lock_depth and self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def open(self) -> bool:
+        """Map existing sidecar files; ``False`` if they are missing or stale."""
+        try:
+            header = json.loads(self._header_path.read_text())
+        except (OSError, ValueError):
+            return False
+        if header.get("generation") != self.generation or not header.get("dim"):
+            return False
+        if not (self._vec_path.exists() and self._ids_path.exists()):
+            return False
+        self.dim = header["dim"]
+        self._map(self._row_count())
+        return True
+
+    def reset(self, dim: int = 0) -> None:
+        """Start empty sidecar files for the current generation."""
+        with self.locked():
+            self._replace(self._vec_path, b"")
+            self._replace(self._ids_path, b"")
+            self.dim = dim
+            self._write_header()
+            self._map(0)
+
+    def invalidate(self) -> None:
+        """Mark the sidecar stale so the next :meth:`open` rebuilds it."""
+        self._header_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _replace(path: Path, data: bytes) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _write_header(self) -> None:
+        self._replace(
+            self._header_path,
+            json.dumps({"dim": self.dim, "generation": self.generation}).encode(),
+        )
+
+    def _row_count(self) -> int:
+        """Return how many complete rows both files hold."""
+        if not self.dim:
+            return 0
+        try:
+            ids_bytes = self._ids_path.stat().st_size
+            vec_bytes = self._vec_path.stat().st_size
+        except OSError:
+            return 0
+        return min(ids_bytes // 8, vec_bytes // (4 * self.dim))
+
+    def _refresh(self) -> None:
+        """Re-map the files as they are now; caller holds :meth:`locked`.
+
+        Another process may have appended, widened or rebuilt them. A
+        half-written row left behind by a crash mid-append is dropped.
+        """
+        try:
+            header = json.loads(self._header_path.read_text())
+        except (OSError, ValueError):
+            header = {}
+        self.generation = header.get("generation", self.generation)
+        self.dim = header.get("dim") or self.dim
+        count = self._row_count()
+        for path, size in ((self._ids_path, count * 8), (self._vec_path, count * 4 * self.dim)):
+            if path.exists() and path.stat().st_size > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        self._map(count)
+
+    def _map(self, count: int) -> None:
+        self._size = count
+        if not count:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            return
+        self._matrix = np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        self._ids = np.memmap(self._ids_path, dtype=np.int64, mode="r", shape=(count,))
+
+    def _widen(self, dim: int) -> None:
+        rows = np.zeros((self._size, dim), dtype=np.float32)
+        rows[:, : self.dim] = self._matrix
+        ids = np.array(self._ids[: self._size])
+        self.dim = dim
+        self._replace(self._vec_path, rows.tobytes())
+        self._replace(self._ids_path, ids.tobytes())
+        self._write_header()
+        self._map(len(ids))
+
+    def add_many(self, items: Iterable[Tuple[int, Sequence[float]]]) -> None:
+        """Append rows to the sidecar files and remap them.
+
+        Ids already present on disk, for example written by another
+        process, are skipped.
+        """
+        items = list(items)
+        if not items:
+            return
+        with self.locked():
+            self._refresh()
+            items = [(i, v) for i, v in items if i > self.last_id]
+            if not items:
+                return
+            dim = max(len(v) for _i, v in items)
+            if dim > self.dim:
+                self._widen(dim)
+            rows = np.zeros((len(items), self.dim), dtype=np.float32)
+            for offset, (_entry_id, vector) in enumerate(items):
+                row = np.asarray(vector, dtype=np.float32)
+                norm = float(np.linalg.norm(row))
+                rows[offset, : len(row)] = row / norm if norm else row
+            ids = np.fromiter((i for i, _v in items), dtype=np.int64, count=len(items))
+            with open(self._vec_path, "ab") as f:
+                f.write(rows.tobytes())
+            with open(self._ids_path, "ab") as f:
+                f.write(ids.tobytes())
+            self._map(self._row_count())
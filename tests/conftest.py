@@ -2,6 +2,8 @@ import sys
 from pathlib import Path
 import types
 
+import pytest
+
 # Ensure the src directory is in the path for imports
 SRC_PATH = Path(__file__).resolve().parents[1] / "src"
 if str(SRC_PATH) not in sys.path:
@@ -24,3 +26,15 @@ if 'langchain_openai' not in sys.modules:
             return types.SimpleNamespace(content='')
     langchain_openai.ChatOpenAI = ChatOpenAI
     sys.modules['langchain_openai'] = langchain_openai
+
+
+@pytest.fixture(autouse=True)
+def _isolated_embedding_cache(tmp_path, monkeypatch):
+    """Keep the persistent embedding cache out of the source tree."""
+    from modules import embedding_cache, embedding_utils
+
+    monkeypatch.setattr(embedding_cache, "_DB_PATH", tmp_path / "embedding_cache.db")
+    monkeypatch.setattr(embedding_utils, "_cache", None)
+    yield
+    if embedding_utils._cache is not None:
+        embedding_utils._cache.close()
@@ -11,7 +11,7 @@ def test_chat_loop_prints_logic(monkeypatch, capsys):
     monkeypatch.setattr(chat_handler.memory_cache, "flush", lambda: None)
     monkeypatch.setattr(chat_handler.event_logger, "log_event", lambda *a, **k: None)
 
-    def fake_handle(user_input):
+    def fake_handle(user_input, **_kwargs):
         return {"final_response": "ok", "thought_process": "tp", "classifications": "c", "logic_notes": "ln"}
 
     monkeypatch.setattr(chat_handler, "handle_user_input", fake_handle)
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import config.config_loader as config_loader
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "neocortex.json"
+    path.write_text(json.dumps({"model": "a", "memory_retrieval": {"recent_limit": 5}, "cmds": ["ls"]}))
+    monkeypatch.setattr(config_loader, "CONFIG_FILE", str(path))
+    monkeypatch.setattr(config_loader, "_snapshot", None)
+    monkeypatch.setattr(config_loader, "_stat_key", None)
+    monkeypatch.setattr(config_loader, "_subscribers", [])
+    return path
+
+
+def test_snapshot_is_cached_and_immutable(config_file, monkeypatch):
+    first = config_loader.load_neocortex_config()
+    assert first.model == "a"
+    assert first.get("memory_retrieval", {}).get("recent_limit") == 5
+    assert first["cmds"] == ("ls",)
+    assert first.to_dict()["cmds"] == ["ls"]
+    with pytest.raises(TypeError):
+        first["model"] = "b"
+
+    # Within the check interval the file is not even stat()ed.
+    config_file.write_text("{}")
+    assert config_loader.load_neocortex_config() is first
+
+    monkeypatch.setattr(config_loader, "CHECK_INTERVAL_MS", 0)
+    config_file.write_text(json.dumps({"model": "a"}))
+    assert config_loader.load_neocortex_config() is not first
+
+
+def test_subscribers_see_changes_and_bad_edits_keep_last_good(config_file, monkeypatch):
+    monkeypatch.setattr(config_loader, "CHECK_INTERVAL_MS", 0)
+    seen = []
+    unsubscribe = config_loader.subscribe(lambda cfg: seen.append(cfg.model))
+    config_loader.load_neocortex_config()
+    assert config_loader.load_neocortex_config().model == "a"
+    assert seen == []
+
+    config_file.write_text(json.dumps({"model": "bigger-model"}))
+    assert config_loader.load_neocortex_config().model == "bigger-model"
+    config_file.write_text("{not json")
+    assert config_loader.load_neocortex_config().model == "bigger-model"
+    assert seen == ["bigger-model"]
+
+    unsubscribe()
+    config_file.write_text(json.dumps({"model": "c"}))
+    config_loader.load_neocortex_config()
+    assert seen == ["bigger-model"]
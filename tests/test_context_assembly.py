@@ -0,0 +1,37 @@
+import time
+import types
+
+import modules.chat_handler as chat_handler
+
+
+def test_slow_stage_is_dropped_from_prompt(monkeypatch):
+    prompts = []
+
+    class FakeModel:
+        def invoke(self, prompt):
+            prompts.append(prompt)
+            return types.SimpleNamespace(content="ok")
+
+    def slow_retrieve(*a, **k):
+        time.sleep(0.5)
+        return ["stale context"]
+
+    monkeypatch.setattr(
+        chat_handler,
+        "load_neocortex_config",
+        lambda: {"context_assembly": {"deadlines_ms": {"relevant": 50}}},
+    )
+    monkeypatch.setattr(chat_handler, "main_bot", FakeModel())
+    monkeypatch.setattr(chat_handler, "retrieve_processed_memory", lambda: {"conversation_history": []})
+    monkeypatch.setattr(chat_handler, "neuron_advice", lambda *a, **k: "be brief")
+    monkeypatch.setattr(chat_handler, "_detect_intent", lambda text: None)
+    monkeypatch.setattr(chat_handler.summarizer, "retrieve_relevant", slow_retrieve)
+    monkeypatch.setattr(chat_handler.event_logger, "log_event", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.memory_cache, "add_message", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.summarizer, "summarize_and_store", lambda *a, **k: None)
+
+    start = time.monotonic()
+    result = chat_handler.handle_user_input("hello")
+    assert time.monotonic() - start < 0.4
+    assert result["final_response"] == "ok"
+    assert prompts == ["Neuron's guidance: be brief\n\nUser: hello\nBot:"]
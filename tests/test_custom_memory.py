@@ -9,6 +9,8 @@ def test_save_context_respects_limit_list(monkeypatch, tmp_path):
 
     for i in range(5):
         memory.save_context(f"u{i}", f"b{i}")
+    assert [entry["user"] for entry in memory.load_memory()] == ["u2", "u3", "u4"]
+    memory.compact()
 
     with open(mem_file) as f:
         data = json.load(f)
@@ -25,6 +27,7 @@ def test_save_context_respects_limit_dict(monkeypatch, tmp_path):
 
     for i in range(4):
         memory.save_context(f"user{i}", f"bot{i}")
+    memory.compact()
 
     with open(mem_file) as f:
         data = json.load(f)
@@ -33,3 +36,55 @@ def test_save_context_respects_limit_dict(monkeypatch, tmp_path):
     history = data["conversation_history"]
     assert len(history) == 2
     assert [msg["user"] for msg in history] == ["user2", "user3"]
+
+
+def test_instances_share_state_and_replay_the_log(monkeypatch, tmp_path):
+    mem_file = tmp_path / "memory.json"
+    monkeypatch.setattr(custom_memory, "load_neocortex_config", lambda: {"memory_limit": 10})
+    writer = custom_memory.CustomMemory(memory_file=str(mem_file))
+    writer.save_context("hi", "hello")
+    assert custom_memory.CustomMemory(memory_file=str(mem_file)).load_memory() == [
+        {"user": "hi", "bot": "hello"}
+    ]
+    # Nothing was rewritten yet; a fresh process rebuilds from file + log.
+    assert json.loads(mem_file.read_text()) == []
+    monkeypatch.setattr(custom_memory, "_backends", {})
+    reopened = custom_memory.CustomMemory(memory_file=str(mem_file))
+    assert reopened.load_memory() == [{"user": "hi", "bot": "hello"}]
+
+
+def test_compaction_keeps_lines_other_processes_appended(monkeypatch, tmp_path):
+    mem_file = tmp_path / "memory.json"
+    monkeypatch.setattr(custom_memory, "load_neocortex_config", lambda: {"memory_limit": 10})
+    memory = custom_memory.CustomMemory(memory_file=str(mem_file))
+    # A backend that is not shared stands in for another process.
+    other = custom_memory._MemoryBackend(str(mem_file))
+
+    other.extend([{"user": "gui", "bot": "1"}])
+    memory.save_context("cli", "2")
+    memory.compact()
+    assert [e["user"] for e in json.loads(mem_file.read_text())] == ["gui", "cli"]
+
+    other.extend([{"user": "gui", "bot": "3"}])
+    other.compact()
+    assert [e["bot"] for e in json.loads(mem_file.read_text())] == ["1", "2", "3"]
+    assert [e["bot"] for e in memory.load_memory()] == ["1", "2"]
+    memory.save_context("cli", "4")
+    assert [e["bot"] for e in memory.load_memory()] == ["1", "2", "3", "4"]
+
+
+def test_append_count_survives_trimming_and_restarts(monkeypatch, tmp_path):
+    mem_file = tmp_path / "memory.json"
+    monkeypatch.setattr(custom_memory, "load_neocortex_config", lambda: {"memory_limit": 2})
+    memory = custom_memory.CustomMemory(memory_file=str(mem_file))
+    for i in range(3):
+        memory.save_context(f"u{i}", f"b{i}")
+    assert memory.load_memory_with_count() == (
+        [{"user": "u1", "bot": "b1"}, {"user": "u2", "bot": "b2"}], 3
+    )
+    memory.compact()
+    memory.save_context("u3", "b3")
+
+    monkeypatch.setattr(custom_memory, "_backends", {})
+    reopened = custom_memory.CustomMemory(memory_file=str(mem_file))
+    assert reopened.load_memory_with_count()[1] == 4
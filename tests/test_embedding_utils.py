@@ -0,0 +1,102 @@
+import threading
+import time
+
+import modules.embedding_utils as embedding_utils
+
+
+class _Vectors(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, texts):
+        self.started.set()
+        self.release.wait(1)
+        self.batches.append(list(texts))
+        return _Vectors([[float(len(t)), 1.0] for t in texts])
+
+
+def test_encode_coalesces_concurrent_requests(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(embedding_utils, "get_model", lambda: model)
+    service = embedding_utils.EmbeddingService()
+    results = {}
+
+    def worker(text):
+        results[text] = service.encode([text])[0]
+
+    threads = [threading.Thread(target=worker, args=("x" * n,)) for n in range(1, 6)]
+    threads[0].start()
+    model.started.wait(1)
+    for t in threads[1:]:
+        t.start()
+    deadline = time.time() + 1
+    while service._queue.qsize() < 4 and time.time() < deadline:
+        time.sleep(0.001)
+    model.release.set()
+    for t in threads:
+        t.join()
+
+    assert results["xxx"] == [3.0, 1.0]
+    assert [len(b) for b in model.batches] == [1, 4]
+
+
+def test_missing_model_is_loaded_once_and_falls_back(monkeypatch):
+    monkeypatch.setattr(embedding_utils, "_model", None)
+    monkeypatch.setattr(embedding_utils, "_model_loaded", False)
+    monkeypatch.setitem(__import__("sys").modules, "sentence_transformers", None)
+    assert embedding_utils.get_model() is None
+    assert embedding_utils._model_loaded
+    assert embedding_utils.model_id() == embedding_utils.hashing_embedder.MODEL_ID
+    vec = embedding_utils.EmbeddingService().encode(["ab"])[0]
+    assert len(vec) == embedding_utils.hashing_embedder.DIM
+
+
+def test_embed_texts_reuses_cached_vectors(tmp_path, monkeypatch):
+    model = FakeModel()
+    model.release.set()
+    monkeypatch.setattr(embedding_utils, "get_model", lambda: model)
+    monkeypatch.setattr(embedding_utils, "_service", embedding_utils.EmbeddingService())
+    cache = embedding_utils.EmbeddingCache(tmp_path / "cache.db", max_items=1)
+    monkeypatch.setattr(embedding_utils, "_cache", cache)
+
+    first = embedding_utils.embed_texts(["a", "bb", "a", "ccc"], batch_size=2)
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+    assert sorted(t for batch in model.batches for t in batch) == ["a", "bb", "ccc"]
+
+    model.batches.clear()
+    assert embedding_utils.embed_texts(["bb", "a"]) == [[2.0, 1.0], [1.0, 1.0]]
+    assert model.batches == []
+    stats = cache.stats()
+    assert stats["memory_items"] == 1 and stats["disk_hits"] >= 1
+    cache.close()
+
+
+def test_hashing_embedder_is_stable_and_ranks_shared_words():
+    from modules import hashing_embedder
+
+    a, b, c = hashing_embedder.embed_many(
+        ["scan the open ports", "which ports are open", "bake a chocolate cake"]
+    )
+    assert hashing_embedder.embed("scan the open ports") == a
+    assert abs(sum(v * v for v in a) - 1.0) < 1e-9
+    dot = lambda x, y: sum(p * q for p, q in zip(x, y))
+    assert dot(a, b) > dot(a, c)
+    assert hashing_embedder.embed("") == [0.0] * hashing_embedder.DIM
+
+
+def test_fallback_embeddings_skip_the_cache(monkeypatch):
+    from modules import hashing_embedder
+
+    def no_cache():
+        raise AssertionError("hashing fallback should not touch the cache")
+
+    monkeypatch.setattr(embedding_utils, "get_model", lambda: None)
+    monkeypatch.setattr(embedding_utils, "get_cache", no_cache)
+    assert embedding_utils.embed_texts(["open ports"]) == [hashing_embedder.embed("open ports")]
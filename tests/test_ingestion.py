@@ -0,0 +1,53 @@
+import threading
+
+import modules.ingestion as ingestion
+
+
+def test_keyed_jobs_run_in_order_and_drain():
+    pipeline = ingestion.IngestionPipeline(workers=3)
+    seen = []
+    for i in range(50):
+        pipeline.submit(seen.append, i, key="history")
+    pipeline.submit(lambda: 1 / 0)
+    assert pipeline.drain(timeout=5)
+    assert seen == list(range(50))
+    stats = pipeline.stats()
+    assert stats["pending"] == 0 and stats["completed"] == 50 and stats["failed"] == 1
+    pipeline.shutdown()
+
+
+def test_full_queue_runs_job_on_caller_thread():
+    pipeline = ingestion.IngestionPipeline(workers=1, max_pending=1, block_timeout=0.01)
+    gate = threading.Event()
+    threads = []
+    pipeline.submit(gate.wait, 5)  # occupies the worker
+    pipeline.submit(lambda: None)  # fills the queue
+    pipeline.submit(lambda: threads.append(threading.current_thread()))
+    assert threads == [threading.current_thread()]
+    assert pipeline.stats()["ran_inline"] == 1
+    gate.set()
+    assert pipeline.drain(timeout=5)
+    pipeline.shutdown()
+
+
+def test_submit_runs_inline_when_disabled(monkeypatch):
+    monkeypatch.setattr(ingestion, "load_neocortex_config", lambda: {"ingestion": {"enabled": False}})
+    seen = []
+    ingestion.submit(seen.append, "now")
+    assert seen == ["now"]
+
+
+def test_full_lane_keeps_keyed_jobs_in_order():
+    pipeline = ingestion.IngestionPipeline(workers=1, max_pending=1, block_timeout=0.01)
+    gate = threading.Event()
+    seen = []
+    pipeline.submit(gate.wait, 5, key="history")  # occupies the worker
+    pipeline.submit(seen.append, 1, key="history")  # fills the queue
+    releaser = threading.Timer(0.1, gate.set)
+    releaser.start()
+    pipeline.submit(seen.append, 2, key="history")  # waits instead of overtaking
+    assert pipeline.drain(timeout=5)
+    assert seen == [1, 2]
+    stats = pipeline.stats()
+    assert stats["waited"] == 1 and stats["ran_inline"] == 0
+    pipeline.shutdown()
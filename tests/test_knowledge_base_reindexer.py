@@ -0,0 +1,19 @@
+import modules.knowledge_base_reindexer as reindexer
+
+
+def test_failing_file_only_skips_itself(tmp_path, monkeypatch, caplog):
+    for name in ("a.txt", "bad.txt", "c.txt"):
+        (tmp_path / name).write_text(name)
+    stored = []
+
+    def store_many(user_id, texts):
+        if "bad.txt" in texts:
+            raise RuntimeError("embedding failed")
+        stored.extend(texts)
+
+    monkeypatch.setattr(reindexer.summarizer, "summarize_and_store_many", store_many)
+    monkeypatch.setattr(reindexer, "BATCH_SIZE", 2)
+    reindexer.reindex_directory(str(tmp_path))
+
+    assert sorted(stored) == ["a.txt", "c.txt"]
+    assert "bad.txt" in caplog.text
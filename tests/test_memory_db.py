@@ -1,4 +1,9 @@
+import sqlite3
+
+import pytest
+
 import modules.memory_db as memory_db
+import modules.vector_index as vector_index
 
 
 def test_add_and_search(tmp_path):
@@ -8,3 +13,319 @@ def test_add_and_search(tmp_path):
     memory_db.add_entry("u1", "t2", "raw2", "sum2", [0.0, 1.0], [])
     results = memory_db.search([1.0, 0.0], k=1)
     assert results and results[0]["summary"] == "sum1"
+
+
+def test_search_uses_cached_index_and_cosine(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    memory_db.add_entry("u1", "t1", "raw1", "sum1", [10.0, 1.0], [])
+    memory_db.search([1.0, 0.0], k=1)  # builds the cached matrix
+    memory_db.add_entry("u1", "t2", "raw2", "sum2", [1.0, 0.0], [])
+    memory_db.add_entry("u1", "t3", "raw3", "sum3", [0.0, 1.0], [])
+    results = memory_db.search([1.0, 0.0], k=2)
+    assert [r["summary"] for r in results] == ["sum2", "sum1"]
+    assert results[0]["score"] > results[1]["score"]
+
+
+def test_ann_index_matches_exact_and_persists(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(
+        memory_db, "_ann_settings", lambda: {"enabled": True, "min_entries": 10**9, "nprobe": 4}
+    )
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    rng = np.random.default_rng(0)
+    for i, vec in enumerate(rng.normal(size=(200, 8))):
+        memory_db.add_entry("u1", f"t{i}", f"raw{i}", f"sum{i}", vec.tolist(), [])
+    query = rng.normal(size=8).tolist()
+    exact = [r["id"] for r in memory_db.search(query, k=5)]
+
+    ann = memory_db.build_ann_index(nlist=4)
+    assert len(ann) == 200
+    assert [r["id"] for r in memory_db.search(query, k=5, nprobe=4)] == exact
+
+    memory_db.add_entry("u1", "new", "raw", "newest", query, [])
+    memory_db.save_ann_index()
+    memory_db.init_db(str(tmp_path / "other.db"))
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    assert memory_db.search(query, k=1, nprobe=1)[0]["summary"] == "newest"
+    assert len(memory_db._anns[None]) == 201
+
+
+def test_search_filters_by_user_tags_and_time(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    memory_db.add_entry("alice", "2024-01-01T00:00:00Z", "r1", "a-old", [1.0, 0.0], ["scan"])
+    memory_db.add_entry("alice", "2024-06-01T00:00:00Z", "r2", "a-new", [1.0, 0.1], ["note"])
+    memory_db.add_entry("bob", "2024-06-01T00:00:00Z", "r3", "b-new", [1.0, 0.0], ["scan"])
+
+    assert {r["summary"] for r in memory_db.search([1.0, 0.0], k=5, user_id="alice")} == {"a-old", "a-new"}
+    assert {r["summary"] for r in memory_db.search([1.0, 0.0], k=5, tags=["scan"])} == {"a-old", "b-new"}
+    recent = memory_db.search([1.0, 0.0], k=5, user_id="alice", since="2024-03-01")
+    assert [r["summary"] for r in recent] == ["a-new"]
+    assert memory_db.search([1.0, 0.0], k=5, user_id="carol") == []
+
+
+def test_hybrid_search_finds_exact_terms(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    memory_db.add_entry("u1", "t1", "scanned 10.0.0.5 found CVE-2021-44228", "log4j host", [0.0, 1.0], [])
+    memory_db.add_entry("u1", "t2", "general chat", "small talk", [1.0, 0.0], [])
+
+    assert [r["summary"] for r in memory_db.keyword_search("10.0.0.5")] == ["log4j host"]
+    results = memory_db.hybrid_search("what about CVE-2021-44228", [1.0, 0.0], k=2)
+    assert results[0]["summary"] == "log4j host"
+    assert {r["summary"] for r in results} == {"log4j host", "small talk"}
+
+
+def test_add_entries_bulk_and_transaction(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    memory_db.search([1.0, 0.0], k=1)
+    ids = memory_db.add_entries(
+        [("u1", "t1", "raw1", "sum1", [1.0, 0.0], ["a"]), ("u1", "t2", "raw2", "sum2", [0.0, 1.0])]
+    )
+    assert ids == [1, 2]
+    with pytest.raises(RuntimeError):
+        with memory_db.transaction():
+            memory_db.add_entry("u1", "t3", "raw3", "lost", [1.0, 0.0], [])
+            raise RuntimeError("boom")
+    assert [r["summary"] for r in memory_db.search([1.0, 0.0], k=5)] == ["sum1", "sum2"]
+    assert [r["id"] for r in memory_db.search([1.0, 0.0], k=5, tags=["a"])] == [1]
+
+
+def test_quantized_search_rescores_full_precision(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(300, 16))
+    memory_db.add_entries((("u1", f"t{i}", f"r{i}", f"s{i}", v.tolist(), []) for i, v in enumerate(vectors)))
+    query = rng.normal(size=16).tolist()
+    exact = memory_db.search(query, k=5)
+    # With quantization off no int8 copy is stored; it is made on first load.
+    with sqlite3.connect(str(tmp_path / "mem.db")) as conn:
+        assert conn.execute("SELECT COUNT(embedding_q) FROM memory").fetchone()[0] == 0
+
+    settings = {"quantization": {"enabled": True, "oversample": 4}}
+    monkeypatch.setattr(memory_db, "_settings", lambda section: settings.get(section, {}))
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    quantized = memory_db.search(query, k=5)
+
+    assert isinstance(memory_db._indexes[None], memory_db.QuantizedIndex)
+    assert memory_db._indexes[None].rows().dtype == np.float32
+    assert [r["id"] for r in quantized] == [r["id"] for r in exact]
+    assert quantized[0]["score"] == pytest.approx(exact[0]["score"], abs=1e-6)
+
+
+def test_mmap_sidecar_reopens_and_catches_up(tmp_path):
+    pytest.importorskip("numpy")
+    db_file = tmp_path / "mem.db"
+    memory_db.init_db(str(db_file))
+    memory_db.add_entry("u1", "t1", "raw1", "sum1", [1.0, 0.0], [])
+    memory_db.search([1.0, 0.0], k=1)
+    memory_db.add_entry("u1", "t2", "raw2", "sum2", [0.0, 1.0], [])
+    assert isinstance(memory_db._indexes[None], memory_db.MappedIndex)
+    assert (tmp_path / "mem.vectors.ids").stat().st_size == 16
+
+    # A row committed without updating the sidecar is replayed on open.
+    with sqlite3.connect(db_file) as conn:
+        conn.execute(
+            "INSERT INTO memory (user_id, timestamp, raw_input, summary, embedding, tags) "
+            "VALUES ('u1', 't3', 'raw3', 'sum3', '[0.6, 0.8]', '[]')"
+        )
+    memory_db.init_db(str(tmp_path / "other.db"))
+    memory_db.init_db(str(db_file))
+    assert memory_db.search([0.6, 0.8], k=1)[0]["summary"] == "sum3"
+    assert memory_db._indexes[None].ids() == [1, 2, 3]
+
+    # A new generation forces a rebuild instead of trusting the old files.
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("DELETE FROM memory WHERE id = 2")
+        memory_db._bump_generation(conn)
+    memory_db.init_db(str(tmp_path / "other.db"))
+    memory_db.init_db(str(db_file))
+    assert [r["summary"] for r in memory_db.search([0.0, 1.0], k=5)] == ["sum3", "sum1"]
+    assert memory_db._indexes[None].ids() == [1, 3]
+
+
+def test_mmap_rebuild_leaves_live_mappings_readable(tmp_path):
+    np = pytest.importorskip("numpy")
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    vectors = np.random.default_rng(2).normal(size=(2000, 64))
+    memory_db.add_entries(("u1", f"t{i}", f"raw {i}", f"s{i}", v.tolist()) for i, v in enumerate(vectors))
+    memory_db.search(vectors[0].tolist(), k=1)
+    old = memory_db._indexes[None]
+
+    assert memory_db.apply_retention(max_rows_per_user=10) == 1990
+    # The old mapping still reads the (much longer) files it was opened on;
+    # truncating them in place used to kill the process with SIGBUS.
+    assert len(old.search(vectors[0].tolist(), k=2000)) == 2000
+    assert len(memory_db.search(vectors[0].tolist(), k=2000)) == 10
+
+
+def test_mmap_appends_from_two_handles_stay_in_sync(tmp_path):
+    pytest.importorskip("numpy")
+    first = memory_db.MappedIndex(tmp_path / "mem.db", 0)
+    first.reset(2)
+    second = memory_db.MappedIndex(tmp_path / "mem.db", 0)
+    assert second.open()
+
+    first.add_many([(1, [1.0, 0.0])])
+    second.add_many([(2, [0.0, 1.0])])
+    first.add_many([(3, [0.0, 1.0, 1.0])])
+    second.add_many([(3, [0.0, 1.0, 1.0]), (4, [1.0, 1.0])])
+    assert first.ids() == [1, 2, 3]
+    assert second.ids() == [1, 2, 3, 4]
+    assert second.search([0.0, 0.0, 1.0], k=1)[0][0] == 3
+
+
+def test_duplicates_merge_into_existing_entry(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    first = memory_db.add_entry("u1", "t1", "What ports are open?", "ports", [1.0, 0.0], [])
+    assert memory_db.add_entry("u1", "t2", "what  ports are OPEN?", "ports", [0.0, 1.0], []) == first
+    near = memory_db.add_entry("u1", "t3", "what ports are open now", "ports", [0.99, 0.01], [])
+    assert near == first
+    # Similar vectors alone are not enough, and other users keep their own rows.
+    assert memory_db.add_entry("u1", "t4", "delete the logs", "logs", [1.0, 0.0], []) != first
+    assert memory_db.add_entry("u2", "t5", "What ports are open?", "ports", [1.0, 0.0], []) != first
+
+    batch = memory_db.add_entries(
+        [("u3", "t6", "same", "s", [0.0, 1.0], []), ("u3", "t7", "same", "s", [0.0, 1.0], [])]
+    )
+    assert batch[0] == batch[1]
+
+    merged = memory_db.search([1.0, 0.0], k=1, user_id="u1")[0]
+    assert merged["id"] == first
+    assert merged["hits"] == 3
+    assert merged["timestamp"] == "t3"
+    assert memory_db.search([0.0, 1.0], k=1, user_id="u3")[0]["hits"] == 2
+
+
+def test_retention_evicts_by_ttl_cap_and_idle_time(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    old, recent = "2000-01-01T00:00:00Z", "2999-01-01T00:00:00Z"
+    ids = memory_db.add_entries(
+        [
+            ("u1", old, "scan results", "a", [1.0, 0.0], ["scan"]),
+            ("u1", old, "kept note", "b", [0.0, 1.0], ["note"]),
+            ("u1", recent, "fresh note", "c", [0.7, 0.7], ["note"]),
+            ("u2", old, "other user", "d", [0.6, 0.8], []),
+        ]
+    )
+    memory_db.search([0.0, 1.0], k=1, user_id="u1")  # touches "kept note"
+    memory_db.flush_access_log()
+
+    assert memory_db.apply_retention(tag_ttl_days={"scan": 30}) == 1
+    assert memory_db.apply_retention(max_idle_days=30) == 1  # u2's untouched row
+    assert memory_db.apply_retention(max_rows_per_user=1) == 1
+    memory_db.optimize()
+
+    remaining = memory_db.search([1.0, 0.0], k=5)
+    assert [r["id"] for r in remaining] == [ids[2]]
+
+
+def test_search_keeps_embedding_models_apart(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    memory_db.add_entry("u1", "t1", "old", "old", [1.0, 0.0], [], "letters")
+    memory_db.add_entry("u1", "t2", "new", "new", [0.8, 0.6], [], "hashing")
+    assert [r["summary"] for r in memory_db.search([1.0, 0.0], k=2)] == ["old", "new"]
+    assert [r["summary"] for r in memory_db.search([1.0, 0.0], k=2, model="hashing")] == ["new"]
+    # A duplicate check never merges vectors from a different embedder.
+    assert memory_db.add_entry("u1", "t3", "old", "old", [1.0, 0.0], [], "hashing") != 1
+
+
+def test_model_queries_use_their_own_index(tmp_path, monkeypatch):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    memory_db.add_entry("u1", "t0", "legacy row", "legacy", [1.0, 0.0], [], "letters")
+    memory_db.add_entries(
+        ("u1", f"t{i}", f"new row {i}", f"n{i}", [1.0, i / 10], [], "hashing") for i in range(1, 4)
+    )
+
+    def no_sql_filter(*args, **kwargs):
+        raise AssertionError("model-only queries should not scan ids in SQL")
+
+    monkeypatch.setattr(memory_db, "_filtered_ids", no_sql_filter)
+    results = memory_db.search([1.0, 0.0], k=5, model="hashing")
+    assert [r["summary"] for r in results] == ["n1", "n2", "n3"]
+    assert memory_db._indexes["hashing"].ids() == [2, 3, 4]
+
+
+def test_retention_retrains_ann_index_in_the_job(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(
+        memory_db, "_ann_settings", lambda: {"enabled": True, "min_entries": 50, "nlist": 4}
+    )
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    vectors = np.random.default_rng(3).normal(size=(120, 8))
+    memory_db.add_entries(
+        (f"u{i % 2}", f"t{i}", f"raw {i}", f"s{i}", v.tolist()) for i, v in enumerate(vectors)
+    )
+    memory_db.search(vectors[0].tolist(), k=1)
+    memory_db._ann_builds[None].join()
+    assert len(memory_db._anns[None]) == 120
+
+    assert memory_db.apply_retention(max_rows_per_user=30) == 60
+    assert len(memory_db._anns[None]) == 60
+    assert memory_db._ann_path().exists()
+
+    def no_training(*args, **kwargs):
+        raise AssertionError("searches should not train the ANN index")
+
+    monkeypatch.setattr(memory_db, "build_ann_index", no_training)
+    assert len(memory_db.search(vectors[1].tolist(), k=5, nprobe=4)) == 5
+
+
+def test_duplicate_check_ignores_other_users_neighbours(tmp_path):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    for n in range(6):
+        memory_db.add_entry(f"other{n}", f"t{n}", "open ports on the box", "p", [0.01, 1.0], [])
+    mine = memory_db.add_entry("me", "t6", "which ports are open on the box", "p", [0.0, 1.0], [])
+    assert memory_db.add_entry("me", "t7", "which ports are open on the box now", "p", [0.01, 1.0], []) == mine
+
+
+def test_duplicate_check_searches_without_an_id_scan(tmp_path, monkeypatch):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    monkeypatch.setattr(memory_db, "_filtered_ids", lambda *a, **k: pytest.fail("id scan"))
+    first = memory_db.add_entry("u1", "t1", "open ports on the box", "p", [0.0, 1.0], [])
+    assert memory_db.add_entry("u1", "t2", "open ports on the box now", "p", [0.0, 1.0], []) == first
+
+    # Within one batch, the same text from two embedders stays two rows.
+    ids = memory_db.add_entries(
+        [("u2", "t3", "same", "s", [1.0, 0.0], [], "a"), ("u2", "t4", "same", "s", [1.0, 0.0], [], "b")]
+    )
+    assert ids[0] != ids[1]
+
+
+def test_ann_index_trains_in_the_background(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(
+        memory_db, "_ann_settings", lambda: {"enabled": True, "min_entries": 50, "nlist": 4}
+    )
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    vectors = np.random.default_rng(5).normal(size=(80, 8))
+    memory_db.add_entries(
+        ("u1", f"t{i}", f"raw {i}", f"s{i}", v.tolist()) for i, v in enumerate(vectors)
+    )
+    # Filtered searches never need the IVF index, so they do not start one.
+    memory_db.search(vectors[0].tolist(), k=1, user_id="u1")
+    assert None not in memory_db._ann_builds
+
+    trained = memory_db.threading.Event()
+    build = memory_db.ann_index.IVFIndex.build
+
+    def slow_build(*args, **kwargs):
+        assert trained.wait(5)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(memory_db.ann_index.IVFIndex, "build", slow_build)
+    # The search is answered exactly while training is still running.
+    assert memory_db.search(vectors[0].tolist(), k=1)[0]["summary"] == "s0"
+    assert None not in memory_db._anns
+    memory_db.add_entry("u1", "late", "late row", "late", [1.0] * 8)
+    trained.set()
+    memory_db._ann_builds[None].join()
+    assert len(memory_db._anns[None]) == 81
+
+
+def test_quantize_many_matches_quantize():
+    np = pytest.importorskip("numpy")
+    vectors = np.random.default_rng(7).normal(size=(50, 12))
+    vectors[3] = 0.0
+    data, scales = vector_index.quantize_many(vectors)
+    for row, vector, scale in zip(data, vectors, scales):
+        assert (row.tobytes(), float(scale)) == vector_index.quantize(vector.tolist())
@@ -7,12 +7,25 @@ import pytest
 import modules.memory_processor as memory_processor
 
 class FakeMemory:
-    def __init__(self, data):
+    def __init__(self, data, window=None):
         self._data = data
+        self._window = window
+        history = data.get("conversation_history", []) if isinstance(data, dict) else data
+        self.appended = len(history)
+
+    def append(self, entry):
+        history = self._data["conversation_history"]
+        history.append(entry)
+        if self._window is not None:
+            del history[:-self._window]
+        self.appended += 1
 
     def load_memory(self):
         return self._data
 
+    def load_memory_with_count(self):
+        return self._data, self.appended
+
 
 def make_fake_model(response_content):
     class FakeModel:
@@ -37,19 +50,146 @@ def run_process_memory(monkeypatch, tmp_path, raw_memory, model_response):
 
 def test_process_memory_valid(monkeypatch, tmp_path):
     raw = {
-        "conversation_history": [{"user": "hi", "bot": "hello"}],
+        "conversation_history": [{"user": "hi, name's Alice", "bot": "hello"}],
         "preferences": {"color": "blue"}
     }
     data = run_process_memory(monkeypatch, tmp_path, raw, '{"personal_data": {"name": "Alice"}}')
     assert data["personal_data"]["name"] == "Alice"
     assert data["preferences"] == {"color": "blue"}
-    assert data["conversation_history"] == [{"user": "hi", "bot": "hello"}]
+    assert data["conversation_history"] == [{"user": "hi, name's Alice", "bot": "hello"}]
 
 
 def test_process_memory_invalid_json(monkeypatch, tmp_path):
     raw = {
-        "conversation_history": [{"user": "hi", "bot": "hello"}],
+        "conversation_history": [{"user": "hi, name's Alice", "bot": "hello"}],
     }
     data = run_process_memory(monkeypatch, tmp_path, raw, 'not json')
     assert data["personal_data"] == {}
-    assert data["conversation_history"] == [{"user": "hi", "bot": "hello"}]
+    assert data["conversation_history"] == [{"user": "hi, name's Alice", "bot": "hello"}]
+
+
+def test_process_memory_only_sends_new_turns(monkeypatch, tmp_path):
+    history = [{"user": "hi", "bot": "hello"}, {"user": "the name is Al", "bot": "hey"}]
+    prompts = []
+
+    class RecordingModel:
+        def invoke(self, prompt):
+            prompts.append(prompt)
+            return SimpleNamespace(content="{}")
+
+    store = FakeMemory({"conversation_history": history}, window=2)
+    monkeypatch.setattr(memory_processor, "memory", store)
+    monkeypatch.setattr(memory_processor, "processing_bot", RecordingModel())
+    monkeypatch.setattr(memory_processor, "load_events", lambda: [])
+    processed_file = tmp_path / "processed.json"
+    monkeypatch.setattr(memory_processor, "PROCESSED_MEMORY_FILE", str(processed_file))
+
+    memory_processor.process_memory()
+    memory_processor.process_memory()
+    assert len(prompts) == 1
+
+    # The window slides: the oldest turn drops out as a new one arrives.
+    store.append({"user": "scan the box", "bot": "done"})
+    memory_processor.process_memory()
+    assert len(prompts) == 1  # no name or preference cue, so the rules are conclusive
+
+    store.append({"user": "use my last name instead", "bot": "ok"})
+    memory_processor.process_memory()
+    assert len(prompts) == 2
+    assert "last name" in prompts[1]
+    assert "the name is Al" not in prompts[1] and "scan the box" not in prompts[1]
+    data = json.loads(processed_file.read_text())
+    assert data["conversation_history"] == history
+
+
+def test_rules_settle_known_facts_without_llm(monkeypatch, tmp_path):
+    history = [{"user": "my name is Bob and my favorite color is green", "bot": "hi Bob"}]
+    before = memory_processor.memory_extractors.stats()["rule_resolved"]
+    data = run_process_memory(
+        monkeypatch, tmp_path, {"conversation_history": history}, "should not be called"
+    )
+    assert data["personal_data"] == {"name": "Bob"}
+    assert data["preferences"] == {"favorite_color": "green"}
+    stats = memory_processor.memory_extractors.stats()
+    assert stats["rule_resolved"] == before + 1
+    assert 0 < stats["rule_hit_rate"] <= 1
+
+
+def test_retrieve_processed_memory_is_cached_until_file_changes(monkeypatch, tmp_path):
+    path = tmp_path / "processed.json"
+    monkeypatch.setattr(memory_processor, "PROCESSED_MEMORY_FILE", str(path))
+    assert memory_processor.retrieve_processed_memory() == {}
+
+    path.write_text(json.dumps({"personal_data": {"name": "Alice"}}))
+    first = memory_processor.retrieve_processed_memory()
+    assert first["personal_data"]["name"] == "Alice"
+    assert memory_processor.retrieve_processed_memory() is first
+
+    path.write_text(json.dumps({"personal_data": {"name": "Bob!"}}))
+    assert memory_processor.retrieve_processed_memory()["personal_data"]["name"] == "Bob!"
+
+    # The writer refreshes the cache itself.
+    data = run_process_memory(
+        monkeypatch, tmp_path, {"conversation_history": [{"user": "my name is Eve", "bot": ""}]}, "{}"
+    )
+    assert memory_processor.retrieve_processed_memory() == data
+
+
+def test_repeated_turns_are_still_seen_as_new(monkeypatch, tmp_path):
+    a, b = {"user": "ping", "bot": "pong"}, {"user": "again", "bot": "sure"}
+    store = FakeMemory({"conversation_history": [a, b] * 3}, window=6)
+    seen = []
+    monkeypatch.setattr(memory_processor, "memory", store)
+    monkeypatch.setattr(memory_processor.memory_extractors, "extract", lambda e: seen.append(list(e)) or {})
+    monkeypatch.setattr(memory_processor, "_llm_personal_data", lambda e: {})
+    monkeypatch.setattr(memory_processor, "load_events", lambda: [])
+    processed_file = tmp_path / "processed.json"
+    monkeypatch.setattr(memory_processor, "PROCESSED_MEMORY_FILE", str(processed_file))
+
+    memory_processor.process_memory()
+    store.append(a)
+    store.append(b)
+    memory_processor.process_memory()
+    assert seen[-1] == [a, b]
+    assert json.loads(processed_file.read_text())["watermark"] == {"appended": 8}
+
+
+def test_history_is_refreshed_without_new_turns(monkeypatch, tmp_path):
+    events = []
+    history = [{"user": "my name is Eve", "bot": ""}]
+    run_process_memory(monkeypatch, tmp_path, {"conversation_history": history}, "{}")
+    monkeypatch.setattr(memory_processor, "load_events", lambda: list(events))
+
+    events.append({"type": "scan"})
+    memory_processor.process_memory()
+    data = json.loads((tmp_path / "processed.json").read_text())
+    assert data["events"] == [{"type": "scan"}]
+    assert data["personal_data"] == {"name": "Eve"}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "can you call me when the scan finishes",
+        "call me back later",
+        "my name is on the list",
+        "my name is bob",
+        "I prefer not to say",
+    ],
+)
+def test_ambiguous_cues_are_left_to_the_llm(text):
+    entry = {"user": text, "bot": ""}
+    facts = memory_processor.memory_extractors.extract([entry])
+    assert facts == {"personal_data": {}, "preferences": {}}
+    assert memory_processor.memory_extractors.unresolved([entry]) == [entry]
+
+
+def test_ambiguous_turn_keeps_the_stored_name(monkeypatch, tmp_path):
+    store = FakeMemory({"conversation_history": [{"user": "call me Alice.", "bot": "ok"}]})
+    run_process_memory(monkeypatch, tmp_path, store._data, "{}")
+    monkeypatch.setattr(memory_processor, "memory", store)
+
+    store.append({"user": "call me back later", "bot": "sure"})
+    memory_processor.process_memory()
+    data = json.loads((tmp_path / "processed.json").read_text())
+    assert data["personal_data"] == {"name": "Alice"}
@@ -0,0 +1,105 @@
+import types
+
+import modules.chat_handler as chat_handler
+from modules import context
+from modules import response_cache
+
+VOCAB = ["what", "ports", "are", "open", "which", "summarize", "scan", "last"]
+
+
+def _embed(text):
+    words = text.split()
+    return [float(words.count(w)) for w in VOCAB]
+
+
+def _stub_embedder(monkeypatch):
+    monkeypatch.setattr(response_cache.embedding_utils, "embed_text", _embed)
+    monkeypatch.setattr(response_cache.embedding_utils, "model_id", lambda: "bow")
+
+
+def test_exact_and_semantic_hits(monkeypatch):
+    _stub_embedder(monkeypatch)
+    cache = response_cache.ResponseCache(similarity_threshold=0.7)
+    assert cache.get("What ports are open?") is None
+    cache.put("What ports are open?", {"final_response": "22, 80"})
+
+    assert cache.get("  what PORTS are open ")["final_response"] == "22, 80"
+    assert cache.get("which ports are open")["final_response"] == "22, 80"
+    assert cache.get("summarize the last scan") is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    _stub_embedder(monkeypatch)
+    now = [100.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = response_cache.ResponseCache(max_entries=2, ttl_seconds=10)
+    cache.put("open ports", {"final_response": "a"})
+    cache.put("last scan", {"final_response": "b"})
+    cache.get("open ports")
+    cache.put("summarize", {"final_response": "c"})
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("last scan") is None
+
+    now[0] += 11
+    assert cache.get("open ports") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_new_command_output_invalidates(monkeypatch):
+    _stub_embedder(monkeypatch)
+    cache = response_cache.ResponseCache()
+    cache.put("what ports are open", {"final_response": "22"})
+    context.set_last("scan", "Open ports on host: 22, 443")
+    assert cache.get("what ports are open") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_handle_user_input_skips_model_on_hit(monkeypatch):
+    _stub_embedder(monkeypatch)
+    calls = []
+
+    class FakeModel:
+        def invoke(self, prompt):
+            calls.append(prompt)
+            return types.SimpleNamespace(content="22, 80")
+
+    monkeypatch.setattr(
+        chat_handler, "load_neocortex_config", lambda: {"response_cache": {"enabled": True}}
+    )
+    monkeypatch.setattr(response_cache, "load_neocortex_config", lambda: {"response_cache": {"enabled": True}})
+    monkeypatch.setattr(response_cache, "_cache", response_cache.ResponseCache())
+    monkeypatch.setattr(chat_handler, "main_bot", FakeModel())
+    monkeypatch.setattr(chat_handler, "_assemble_context", lambda *a, **k: {})
+    monkeypatch.setattr(chat_handler.event_logger, "log_event", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.memory_cache, "add_message", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.summarizer, "summarize_and_store", lambda *a, **k: None)
+
+    first = chat_handler.handle_user_input("What ports are open?")
+    second = chat_handler.handle_user_input("what ports are open")
+    assert first == second
+    assert len(calls) == 1
+    assert response_cache.stats()["exact_hits"] == 1
+
+
+def test_questions_about_other_hosts_never_share_a_reply(monkeypatch):
+    _stub_embedder(monkeypatch)
+    cache = response_cache.ResponseCache(similarity_threshold=0.7)
+    cache.put("what ports are open on 10.0.0.1", {"final_response": "22"})
+    # Identical bag-of-words vectors, but a different host.
+    assert cache.get("which ports are open on 10.0.0.2") is None
+    assert cache.get("which ports are open on 10.0.0.1")["final_response"] == "22"
+
+
+def test_fallback_embeddings_only_serve_exact_matches(monkeypatch):
+    hashing_embedder = response_cache.embedding_utils.hashing_embedder
+    monkeypatch.setattr(response_cache.embedding_utils, "embed_text", hashing_embedder.embed)
+    monkeypatch.setattr(
+        response_cache.embedding_utils, "model_id", lambda: hashing_embedder.MODEL_ID
+    )
+    cache = response_cache.ResponseCache()
+    cache.put("what ports are open on 10.0.0.1", {"final_response": "22"})
+    assert cache.get("what ports are open on 10.0.0.2") is None
+    assert cache.get("What ports are open on 10.0.0.1?")["final_response"] == "22"
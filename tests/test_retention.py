@@ -0,0 +1,38 @@
+import os
+
+import modules.chat_db as chat_db
+import modules.memory_db as memory_db
+import modules.retention as retention
+
+
+def test_run_compaction_prunes_chat_and_sessions(tmp_path, monkeypatch):
+    memory_db.init_db(str(tmp_path / "mem.db"))
+    monkeypatch.setattr(chat_db, "_DB_PATH", tmp_path / "chat.db")
+    monkeypatch.setattr(chat_db, "_pool", None)
+    monkeypatch.setattr(retention, "SESSIONS_DIR", tmp_path)
+    monkeypatch.setattr(
+        retention,
+        "load_neocortex_config",
+        lambda: {"retention": {"max_rows_per_user": 1, "chat_max_age_days": 7, "session_max_age_days": 7}},
+    )
+    memory_db.add_entries(
+        [("u1", "2000-01-01T00:00:00Z", "one", "a", [1.0, 0.0], []),
+         ("u1", "2001-01-01T00:00:00Z", "two", "b", [0.0, 1.0], [])]
+    )
+    chat_db.record_message(1, "user", "fresh")
+    with chat_db.transaction() as conn:
+        conn.execute("INSERT INTO messages VALUES (1, '2000-01-01T00:00:00Z', 'user', 'stale')")
+    stale = tmp_path / "session_1.jsonl"
+    stale.write_text("{}\n")
+    os.utime(stale, (0, 0))
+    (tmp_path / "session_2.jsonl").write_text("{}\n")
+
+    assert retention.run_compaction() == {"memories": 1, "chat_rows": 1, "sessions": 1}
+    assert chat_db.get_messages(1) == [("user", "fresh")]
+    assert [p.name for p in tmp_path.glob("session_*.jsonl")] == ["session_2.jsonl"]
+    chat_db._get_pool().close()
+
+
+def test_background_compaction_respects_enabled_flag(monkeypatch):
+    monkeypatch.setattr(retention, "load_neocortex_config", lambda: {"retention": {"enabled": False}})
+    assert retention.start_background_compaction() is None
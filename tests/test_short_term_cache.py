@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import models.custom_memory as custom_memory
+from modules.short_term_cache import ShortTermMemoryCache
+
+
+def make_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(custom_memory, "load_neocortex_config", lambda: {"memory_limit": 50})
+    store = custom_memory.CustomMemory(memory_file=str(tmp_path / "memory.json"))
+    writes = []
+    original = store.save_contexts
+    store.save_contexts = lambda entries: (writes.append(len(entries)), original(entries))
+    return store, writes
+
+
+def test_count_threshold_flushes_in_one_batch(tmp_path, monkeypatch):
+    store, writes = make_store(tmp_path, monkeypatch)
+    cache = ShortTermMemoryCache(limit=3, store=store, max_age=60)
+    for i in range(3):
+        cache.add_message(f"u{i}", f"b{i}")
+    assert writes == [3]
+    assert [e["user"] for e in store.load_memory()] == ["u0", "u1", "u2"]
+
+
+def test_age_threshold_flushes_in_background(tmp_path, monkeypatch):
+    store, writes = make_store(tmp_path, monkeypatch)
+    cache = ShortTermMemoryCache(limit=100, store=store, max_age=0.05)
+    cache.add_message("hi", "hello")
+    deadline = time.time() + 2
+    while not writes and time.time() < deadline:
+        time.sleep(0.01)
+    assert writes == [1]
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path, monkeypatch):
+    store, _writes = make_store(tmp_path, monkeypatch)
+    journal = str(tmp_path / "cache.journal")
+    crashed = ShortTermMemoryCache(limit=100, store=store, max_age=60, journal_path=journal)
+    crashed.add_message("unsaved", "reply")
+    assert store.load_memory() == []
+
+    crashed._owner.close()  # the process exits and its lock is released
+    ShortTermMemoryCache(store=store, journal_path=journal)
+    assert store.load_memory() == [{"user": "unsaved", "bot": "reply"}]
+
+
+def test_live_processes_keep_their_journals(tmp_path, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    store, _writes = make_store(tmp_path, monkeypatch)
+    journal = str(tmp_path / "cache.journal")
+    live = tmp_path / "cache.journal.4242"
+    dead = tmp_path / "cache.journal.4343"
+    live.write_text('{"user": "live", "bot": ""}\n')
+    dead.write_text('{"user": "dead", "bot": ""}\n')
+    with open(str(live) + ".lock", "a+b") as owner:
+        fcntl.flock(owner, fcntl.LOCK_EX)
+        cache = ShortTermMemoryCache(store=store, journal_path=journal)
+        assert store.load_memory() == [{"user": "dead", "bot": ""}]
+        assert live.exists() and not dead.exists()
+
+        cache.add_message("mine", "reply")
+        ShortTermMemoryCache(store=store, journal_path=journal)
+        # Neither the other live process's journal nor ours was replayed.
+        assert store.load_memory() == [{"user": "dead", "bot": ""}]
+        assert live.exists()
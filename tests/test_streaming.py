@@ -0,0 +1,105 @@
+import builtins
+import types
+
+import blizz_gui
+import modules.chat_handler as chat_handler
+from modules.streaming import ThinkSplitter
+
+
+def _stub_turn(monkeypatch, chunks, config=None):
+    class FakeModel:
+        def invoke(self, prompt):
+            return types.SimpleNamespace(content="".join(chunks))
+
+        def stream(self, prompt):
+            for chunk in chunks:
+                yield types.SimpleNamespace(content=chunk)
+
+    monkeypatch.setattr(chat_handler, "load_neocortex_config", lambda: config or {})
+    monkeypatch.setattr(chat_handler, "main_bot", FakeModel())
+    monkeypatch.setattr(chat_handler, "_assemble_context", lambda *a, **k: {})
+    monkeypatch.setattr(chat_handler.event_logger, "log_event", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.memory_cache, "add_message", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.summarizer, "summarize_and_store", lambda *a, **k: None)
+
+
+def test_splitter_handles_marker_across_chunks():
+    splitter = ThinkSplitter()
+    chat = logic = ""
+    for chunk in ["Hello [", "[TH", "INK]] because", " reasons"]:
+        c, l = splitter.feed(chunk)
+        chat, logic = chat + c, logic + l
+    assert chat == "Hello "
+    assert logic == " because reasons"
+    assert splitter.chat_text == "Hello"
+    assert splitter.logic_text == "because reasons"
+
+
+def test_splitter_releases_false_prefix():
+    splitter = ThinkSplitter()
+    assert splitter.feed("a [[") == ("a ", "")
+    assert splitter.feed("b") == ("[[b", "")
+    splitter.feed(" [")
+    assert splitter.finish() == ("[", "")
+    assert splitter.chat_text == "a [[b ["
+
+
+def test_handle_user_input_streams_tokens(monkeypatch):
+    _stub_turn(monkeypatch, ["Hel", "lo"], {"use_emoji": True})
+    tokens = []
+    result = chat_handler.handle_user_input("hi", on_token=tokens.append)
+    assert tokens == ["Hel", "lo", " 😊"]
+    assert result["final_response"] == "Hello 😊"
+
+
+def test_json_reply_is_sent_once_parsed(monkeypatch):
+    _stub_turn(monkeypatch, ['{"final_response": ', '"hey", "logic_notes": "n"}'])
+    tokens = []
+    result = chat_handler.handle_user_input("hi", on_token=tokens.append)
+    assert tokens == ["hey"]
+    assert result["logic_notes"] == "n"
+
+
+def test_chat_loop_prints_stream_and_think(monkeypatch, capsys):
+    _stub_turn(monkeypatch, ["Hi ", "there[[THI", "NK]]pondering"])
+    inputs = iter(["hello", "exit"])
+    monkeypatch.setattr(builtins, "input", lambda *_: next(inputs))
+    monkeypatch.setattr(chat_handler, "generate_contextual_response", lambda *_: None)
+    monkeypatch.setattr(chat_handler, "process_memory", lambda *a, **k: None)
+    monkeypatch.setattr(chat_handler.memory_cache, "flush", lambda: None)
+
+    chat_handler.chat_loop()
+    out = capsys.readouterr().out
+    assert "[NEURAL-BOT] >> Hi there\n" in out
+    assert "---\nthink: pondering" in out
+
+
+def test_gui_session_streams_into_panes(monkeypatch):
+    _stub_turn(monkeypatch, ["Hi ", "there[[THINK]]", "pondering"])
+    monkeypatch.setattr(blizz_gui, "handle_user_input", chat_handler.handle_user_input)
+
+    class DummyWidget:
+        content = ""
+
+    s = object.__new__(blizz_gui.ChatSession)
+    s.messages = []
+    s._streaming = False
+    s.chat_log = DummyWidget()
+    s.logic_box = DummyWidget()
+    s.gui = types.SimpleNamespace(root=types.SimpleNamespace(after=lambda _ms, fn: fn()))
+    history = []
+
+    def append(widget, text):
+        widget.content += text
+
+    s._append_text = append
+    s.append_history = lambda role, text: history.append((role, text))
+    s.render_to_top = types.MethodType(blizz_gui.ChatSession.render_to_top, s)
+    s.render_message = types.MethodType(blizz_gui.ChatSession.render_message, s)
+    s.update_displays = types.MethodType(blizz_gui.ChatSession.update_displays, s)
+
+    s._stream_reply("hello")
+    assert s.chat_log.content == "Bot: Hi there\n"
+    assert s.logic_box.content == "pondering\n"
+    assert s.messages == [{"type": "assistant_response", "content": "Hi there"}]
+    assert history == [("bot", "Hi there")]
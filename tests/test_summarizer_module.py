@@ -6,3 +6,48 @@ def test_summarize_text_fallback(monkeypatch):
     monkeypatch.setitem(__import__('sys').modules, 'transformers', None)
     text = 'hello world'
     assert summarizer.summarize_text(text, max_length=20) == text
+
+
+def test_summarize_texts_gates_caches_and_batches(monkeypatch):
+    calls = []
+
+    def fake_pipeline(texts, **kwargs):
+        calls.append(list(texts))
+        return [{"summary_text": f"summary {len(t)}"} for t in texts]
+
+    monkeypatch.setattr(summarizer, "_pipeline", fake_pipeline)
+    monkeypatch.setattr(summarizer, "_pipeline_loaded", True)
+    monkeypatch.setattr(summarizer, "_cache", summarizer.OrderedDict())
+    long_a = "word " * 60
+    long_b = "other " * 60
+
+    out = summarizer.summarize_texts(["short note", long_a, long_b, long_a])
+    assert out == ["short note", f"summary {len(long_a)}", f"summary {len(long_b)}", f"summary {len(long_a)}"]
+    assert calls == [[long_a, long_b]]
+
+    assert summarizer.summarize_text(long_b) == f"summary {len(long_b)}"
+    assert len(calls) == 1
+
+
+def test_chunk_words_overlaps_and_streams():
+    chunks = list(summarizer.chunk_words(iter(["a b c", "d e f g"]), size=4, overlap=1))
+    assert chunks == ["a b c d", "d e f g"]
+    assert list(summarizer.chunk_words(["a b c d"], size=4, overlap=1)) == ["a b c d"]
+
+
+def test_summarize_long_reduces_hierarchically(monkeypatch):
+    seen = []
+
+    def fake_pipeline(texts, **kwargs):
+        seen.extend(len(t.split()) for t in texts)
+        return [{"summary_text": " ".join(t.split()[:5] * 10)} for t in texts]
+
+    monkeypatch.setattr(summarizer, "_pipeline", fake_pipeline)
+    monkeypatch.setattr(summarizer, "_pipeline_loaded", True)
+    monkeypatch.setattr(summarizer, "_cache", summarizer.OrderedDict())
+    pieces = (f"msg{i} " + "filler " * 99 for i in range(50))
+
+    summary = summarizer.summarize_long(pieces, chunk_size=200, overlap=20, batch_size=4)
+    assert summary.split()[0] == "msg0"
+    assert max(seen) <= 200
+    assert len(seen) > 25